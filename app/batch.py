@@ -0,0 +1,248 @@
+"""
+Headless batch mode: turn a list of job URLs into cold emails without the Streamlit UI.
+
+    python app/batch.py urls.txt -o out/
+    python app/batch.py targets.csv -o out/ --per-job-files
+
+Input is either a text file with one URL per line (blank lines and `#` comments are ignored)
+or a CSV with a `url` column and optional `company`, `recipient` and `role` columns.
+Fetch, extract and write run as separate pipelined stages, each with its own worker pool.
+Every finished URL is appended to `<out>/results.jsonl`, which doubles as the checkpoint:
+re-running the same command skips URLs that already completed successfully.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import queue
+import re
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import scheduler
+import telemetry
+from generation import GenerationEngine
+from extractors import extract_structured
+from scraper import extract_company_from_url, fetch_page
+from utils import clean_text
+
+DEFAULT_RECIPIENT = "採用担当者様"
+DEFAULT_ROLE = "AI/ML Engineer"
+
+
+def read_targets(path):
+    """Return a list of {url, company, recipient, role} dicts from a URL list or a CSV file."""
+    targets = []
+    # utf-8-sig: Excel writes a BOM, which would otherwise end up in the first header name
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if path.lower().endswith(".csv"):
+            reader = csv.DictReader(f)
+            if "url" not in (reader.fieldnames or []):
+                raise ValueError(f"{path}: CSV has no 'url' column (found: {', '.join(reader.fieldnames or [])})")
+            for row in reader:
+                url = (row.get("url") or "").strip()
+                if url:
+                    targets.append({
+                        "url": url,
+                        "company": (row.get("company") or "").strip() or extract_company_from_url(url),
+                        "recipient": (row.get("recipient") or "").strip() or DEFAULT_RECIPIENT,
+                        "role": (row.get("role") or "").strip() or DEFAULT_ROLE,
+                    })
+        else:
+            for line in f:
+                url = line.strip()
+                if url and not url.startswith("#"):
+                    targets.append({
+                        "url": url,
+                        "company": extract_company_from_url(url),
+                        "recipient": DEFAULT_RECIPIENT,
+                        "role": DEFAULT_ROLE,
+                    })
+    return targets
+
+
+def target_key(target):
+    return f"{target['url']}|{target['company']}|{target['recipient']}"
+
+
+def load_checkpoint(results_path):
+    """Keys of targets that already finished successfully."""
+    done = set()
+    if not os.path.exists(results_path):
+        return done
+    with open(results_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line after a crash
+            if record.get("status") == "ok":
+                done.add(record["key"])
+    return done
+
+
+def _slug(text):
+    return re.sub(r"[^\w.-]+", "_", text, flags=re.UNICODE).strip("_")[:80] or "job"
+
+
+class BatchRunner:
+    def __init__(self, chain, portfolio, out_dir, fetch_workers=8, extract_workers=4, write_workers=4,
+                 per_job_files=False, use_cache=True):
+        self.chain = chain
+        self.portfolio = portfolio
+        self.out_dir = out_dir
+        self.results_path = os.path.join(out_dir, "results.jsonl")
+        self.per_job_files = per_job_files
+        self.use_cache = use_cache
+        self.pools = {
+            "fetch": ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix="fetch"),
+            "extract": ThreadPoolExecutor(max_workers=extract_workers, thread_name_prefix="extract"),
+            "write": ThreadPoolExecutor(max_workers=write_workers, thread_name_prefix="write"),
+        }
+        self.done = queue.Queue()
+
+    # --- stages ---------------------------------------------------------
+
+    def _fetch(self, record):
+        page = fetch_page(record["url"])
+        jobs, extractor_name = extract_structured(record["url"], page.html)
+        if jobs:
+            # Structured data on the page: no LLM extraction needed
+            record["extractor"] = extractor_name
+            record["jobs"] = [{"job": job} for job in jobs]
+            return "write"
+        if not page.text or len(page.text) < 200:
+            raise ValueError(f"Fetched text too short ({len(page.text)} chars); page may be JS-rendered or blocked")
+        with telemetry.span("clean", chars=len(page.text)):
+            record["text"] = clean_text(page.text)
+        return "extract"
+
+    def _extract(self, record):
+        record["extractor"] = "llm"
+        jobs = self.chain.extract_jobs(record.pop("text"), use_cache=self.use_cache)
+        if not jobs:
+            raise ValueError("No jobs found on page")
+        record["jobs"] = [{"job": job} for job in jobs]
+        return "write"
+
+    def _write(self, record):
+        engine = GenerationEngine(self.chain, self.portfolio, use_cache=self.use_cache)
+        jobs = [entry["job"] for entry in record["jobs"]]
+        for result in engine.generate(jobs, record["company"], record["recipient"], record["role"]):
+            record["jobs"][result.index].update({
+                "role": result.role,
+                "techstack": result.techstack,
+                "email": result.email,
+                "error": str(result.error) if result.error else None,
+            })
+        return None
+
+    def _run_stage(self, stage, record):
+        handler = {"fetch": self._fetch, "extract": self._extract, "write": self._write}[stage]
+        try:
+            # every stage of a record reports under the record's trace id; LLM calls yield to the UI
+            with telemetry.trace(f"batch_{stage}", trace_id=record["trace_id"], url=record["url"]), \
+                    scheduler.priority(scheduler.BATCH):
+                next_stage = handler(record)
+        except Exception as e:
+            record.pop("text", None)
+            record.update(status="error", stage=stage, error=str(e), traceback=traceback.format_exc())
+            self.done.put(record)
+            return
+        if next_stage:
+            self.pools[next_stage].submit(self._run_stage, next_stage, record)
+        else:
+            failed = [j for j in record["jobs"] if j.get("error")]
+            record["status"] = "error" if failed and len(failed) == len(record["jobs"]) else "ok"
+            self.done.put(record)
+
+    # --- output ---------------------------------------------------------
+
+    def _save(self, record, out):
+        record["elapsed"] = round(time.monotonic() - record.pop("_started"), 3)
+        if self.per_job_files and record["status"] == "ok":
+            for n, entry in enumerate(record["jobs"], 1):
+                if entry.get("email"):
+                    uid = hashlib.sha1(record["key"].encode("utf-8")).hexdigest()[:8]
+                    name = f"{_slug(record['company'])}_{uid}_{n:02d}_{_slug(entry.get('role') or 'job')}.txt"
+                    path = os.path.join(self.out_dir, "emails", name)
+                    with open(path, "w", encoding="utf-8") as f:
+                        f.write(entry["email"])
+                    entry["email_file"] = os.path.relpath(path, self.out_dir)
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+        os.fsync(out.fileno())
+
+    def run(self, targets, log=print):
+        os.makedirs(self.out_dir, exist_ok=True)
+        if self.per_job_files:
+            os.makedirs(os.path.join(self.out_dir, "emails"), exist_ok=True)
+
+        completed = load_checkpoint(self.results_path)
+        todo = [t for t in targets if target_key(t) not in completed]
+        log(f"{len(targets)} targets, {len(targets) - len(todo)} already done, {len(todo)} to process")
+
+        for target in todo:
+            record = dict(target, key=target_key(target), trace_id=telemetry.new_trace_id(),
+                          _started=time.monotonic())
+            self.pools["fetch"].submit(self._run_stage, "fetch", record)
+
+        ok = failed = 0
+        try:
+            with open(self.results_path, "a", encoding="utf-8") as out:
+                for n in range(1, len(todo) + 1):
+                    record = self.done.get()
+                    self._save(record, out)
+                    if record["status"] == "ok":
+                        ok += 1
+                    else:
+                        failed += 1
+                    log(f"[{n}/{len(todo)}] {record['status']:5} {record['url']}"
+                        + (f" ({record.get('stage')}: {record.get('error')})" if record["status"] != "ok" else ""))
+        finally:
+            for pool in self.pools.values():
+                pool.shutdown(wait=False, cancel_futures=True)
+        return ok, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate cold emails for a list of job URLs.")
+    parser.add_argument("input", help="text file with one URL per line, or CSV with url/company/recipient/role")
+    parser.add_argument("-o", "--out-dir", default="batch_output", help="output directory (results.jsonl)")
+    parser.add_argument("--fetch-workers", type=int, default=8)
+    parser.add_argument("--extract-workers", type=int, default=4)
+    parser.add_argument("--write-workers", type=int, default=4)
+    parser.add_argument("--per-job-files", action="store_true", help="also write one .txt file per email")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the LLM cache")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus metrics on this port while running (default: METRICS_PORT)")
+    args = parser.parse_args(argv)
+
+    telemetry.start_metrics_server(args.metrics_port)
+
+    from resources import get_chain, get_portfolio
+
+    try:
+        targets = read_targets(args.input)
+    except ValueError as e:
+        parser.error(str(e))
+    portfolio = get_portfolio()
+    portfolio.load_portfolio()
+    runner = BatchRunner(
+        get_chain(), portfolio, args.out_dir,
+        fetch_workers=args.fetch_workers,
+        extract_workers=args.extract_workers,
+        write_workers=args.write_workers,
+        per_job_files=args.per_job_files,
+        use_cache=not args.no_cache,
+    )
+    ok, failed = runner.run(targets)
+    print(f"✅ {ok} succeeded, ❌ {failed} failed -> {runner.results_path}")
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "/tmp/.cache/coldmail/llm_cache.sqlite")
+DEFAULT_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+DEFAULT_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+
+def _env_disabled():
+    return os.getenv("LLM_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+
+
+class LLMCache:
+    """
+    Content-addressed on-disk cache for LLM completions (SQLite).
+    Entries expire after `ttl` seconds; the least recently used rows are evicted above `max_entries`.
+    """
+
+    def __init__(self, path=None, ttl=None, max_entries=None, enabled=None):
+        self.path = path or DEFAULT_CACHE_PATH
+        self.ttl = DEFAULT_TTL if ttl is None else ttl
+        self.max_entries = DEFAULT_MAX_ENTRIES if max_entries is None else max_entries
+        self.enabled = (not _env_disabled()) if enabled is None else enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @staticmethod
+    def make_key(*parts):
+        """sha256 over the JSON encoding of the given parts (model name, rendered prompt, inputs...)."""
+        payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _db(self):
+        if self._conn is None:
+            if self.path != ":memory:":
+                pathlib.Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache(accessed)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key):
+        """Return the cached value or None (counts a hit/miss)."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT value, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row and self.ttl and now - row[1] > self.ttl:
+                db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                db.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            db.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key))
+            db.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, value):
+        if not self.enabled or value is None:
+            return
+        with self._lock:
+            db = self._db()
+            now = time.time()
+            db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            if self.max_entries:
+                db.execute(
+                    "DELETE FROM llm_cache WHERE key IN ("
+                    " SELECT key FROM llm_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db().execute("DELETE FROM llm_cache")
+            self._db().commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        with self._lock:
+            size = self._db().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] if self.enabled else 0
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "entries": size,
+        }
@@ -1,46 +1,189 @@
+import contextvars
+import copy
 import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from dotenv import load_dotenv
 from langchain_core.exceptions import OutputParserException
 from langchain_core.output_parsers import JsonOutputParser
-from langchain_core.prompts import PromptTemplate
 from langchain_groq import ChatGroq
 from pydantic import SecretStr
 
+import telemetry
+from cache import LLMCache
+from prompts import EXTRACT_PROMPT, MAIL_PROMPT
+from scheduler import default_scheduler
+from singleflight import SingleFlight
+from skills import default_skill_index
+from utils import estimate_tokens, fit_sections, split_job_chunks
+
+EXTRACT_CHUNK_TOKENS = int(os.getenv("EXTRACT_CHUNK_TOKENS", "6000"))
+EXTRACT_CONCURRENCY = int(os.getenv("EXTRACT_CONCURRENCY", "4"))
+# Token budget for the per-job sections of the email prompt (skills, skill matches, description)
+MAIL_INPUT_TOKENS = int(os.getenv("MAIL_INPUT_TOKENS", "300"))
+
 load_dotenv()
 
 
 class Chain:
 
-    def __init__(self):
-        self.llm = ChatGroq(temperature=0, groq_api_key=os.getenv("GROQ_API_KEY"), model_name="llama-3.3-70b-versatile")
-
-    def extract_jobs(self, cleaned_text):
-        prompt_extract = PromptTemplate.from_template(
-            """
-            ### SCRAPED TEXT FROM WEBSITE:
-            {page_data}
-            ### INSTRUCTION:
-            The scraped text is from the career's page of a website.
-            Your job is to extract the job postings and return them in JSON format containing the following keys: `role`, `experience`, `skills` and `description`.
-            Only return the valid JSON.
-            ### VALID JSON (NO PREAMBLE):
-            """
-        )
-        chain_extract = prompt_extract | self.llm
-        res = chain_extract.invoke(input={"page_data": cleaned_text})
+    def __init__(self, cache=None, skill_index=None, llm=None, scheduler=None):
+        self.model_name = "llama-3.3-70b-versatile"
+        # any LangChain chat model can stand in for Groq (benchmarks use a recorded, offline one);
+        # retries are left to the scheduler, which also knows about the rate limits
+        self.llm = llm if llm is not None else ChatGroq(temperature=0, groq_api_key=os.getenv("GROQ_API_KEY"),
+                                                        model_name=self.model_name, max_retries=0)
+        self.scheduler = scheduler if scheduler is not None else default_scheduler()
+        # temperature=0 -> identical prompts give identical answers, so completions are cached on disk
+        self.cache = cache if cache is not None else LLMCache()
+        self._skill_index = skill_index  # None: follow the portfolio (refreshed when it syncs)
+        # Compiled once; the static system message comes first so providers can cache the prefix
+        self.extract_prompt = EXTRACT_PROMPT
+        self.mail_prompt = MAIL_PROMPT
+        # identical extractions running at the same time (same page pasted in several sessions) share one call
+        self.inflight = SingleFlight("extract_jobs", share=copy.deepcopy)
+
+    @property
+    def skill_index(self):
+        return self._skill_index if self._skill_index is not None else default_skill_index()
+
+    def _invoke_cached(self, prompt, inputs, use_cache=True, call="llm"):
+        """Call the llm with the rendered prompt unless it is already in the cache; returns the text content."""
+        with telemetry.span("llm_call", call=call, model=self.model_name) as record:
+            messages = prompt.format_prompt(**inputs)  # rendered once, for the cache key and the request
+            text = messages.to_string()
+            key = self.cache.make_key(self.model_name, text)
+            if use_cache:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    record["cache_hit"] = True
+                    return cached
+            record["cache_hit"] = False
+            res = self.scheduler.run(self.llm.invoke, messages, prompt_tokens=estimate_tokens(text), record=record)
+            telemetry.record_llm_usage(call, res, record)
+            self.cache.set(key, res.content)
+            return res.content
+
+    def _stream_cached(self, prompt, inputs, use_cache=True, call="llm"):
+        """Streaming variant of _invoke_cached: yields text chunks as they arrive from the model."""
+        with telemetry.span("llm_call", call=call, model=self.model_name, stream=True) as record:
+            messages = prompt.format_prompt(**inputs)
+            text = messages.to_string()
+            key = self.cache.make_key(self.model_name, text)
+            if use_cache:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    record["cache_hit"] = True
+                    yield cached
+                    return
+            record["cache_hit"] = False
+            parts, merged = [], None
+            stream = self.scheduler.stream(self.llm.stream, messages, prompt_tokens=estimate_tokens(text),
+                                           record=record)
+            try:
+                for chunk in stream:
+                    merged = chunk if merged is None else merged + chunk  # carries the usage metadata
+                    if chunk.content:
+                        if not parts:
+                            record["first_token_s"] = round(time.time() - record["start"], 6)
+                        parts.append(chunk.content)
+                        yield chunk.content
+            finally:
+                # Closing the stream aborts the upstream HTTP request when the consumer stops early
+                stream.close()
+                if merged is not None:
+                    telemetry.record_llm_usage(call, merged, record)
+            self.cache.set(key, "".join(parts))
+
+    def _extract_chunk(self, cleaned_text, use_cache=True):
+        content = self._invoke_cached(self.extract_prompt, {"page_data": cleaned_text}, use_cache=use_cache,
+                                      call="extract_jobs")
         try:
             json_parser = JsonOutputParser()
-            res = json_parser.parse(res.content)
+            res = json_parser.parse(content)
         except OutputParserException:
             raise OutputParserException("Context too big. Unable to parse jobs.")
         return res if isinstance(res, list) else [res]
 
+    def extract_jobs(self, cleaned_text, use_cache=True):
+        """
+        Extract job postings. Pages over EXTRACT_CHUNK_TOKENS are split on job boundaries,
+        the chunks are extracted concurrently and the postings merged / de-duplicated.
+        Concurrent calls for the same text are coalesced into one extraction.
+        """
+        key = (use_cache, self.cache.make_key(self.model_name, cleaned_text))
+        return self.inflight.do(key, self._extract_jobs, cleaned_text, use_cache)
+
+    def _extract_jobs(self, cleaned_text, use_cache=True):
+        chunks = split_job_chunks(cleaned_text, max_tokens=EXTRACT_CHUNK_TOKENS)
+        if len(chunks) == 1:
+            with telemetry.span("extract", chunks=1):
+                return self._extract_chunk(chunks[0], use_cache=use_cache)
+
+        results, errors = [], []
+        with telemetry.span("extract", chunks=len(chunks)), \
+                ThreadPoolExecutor(max_workers=min(EXTRACT_CONCURRENCY, len(chunks))) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, self._extract_chunk, chunk, use_cache)
+                       for chunk in chunks]
+            for fut in futures:
+                try:
+                    results.append(fut.result())
+                except OutputParserException as e:
+                    errors.append(e)
+        if not results:
+            raise OutputParserException(f"Unable to parse jobs from any of the {len(chunks)} page chunks.")
+        return self._merge_jobs(results)
+
+    @staticmethod
+    def _merge_jobs(job_lists):
+        """Merge per-chunk results, de-duplicating by normalized role + description prefix."""
+        def norm(value):
+            return re.sub(r"\W+", " ", str(value or "")).strip().lower()
+
+        merged = {}
+        for jobs in job_lists:
+            for job in jobs:
+                if not isinstance(job, dict) or not (job.get("role") or job.get("description")):
+                    continue
+                key = (norm(job.get("role")), norm(job.get("description"))[:120])
+                if key not in merged:
+                    merged[key] = dict(job)
+                    continue
+                kept = merged[key]
+                if len(str(job.get("description") or "")) > len(str(kept.get("description") or "")):
+                    kept["description"] = job["description"]
+                skills = kept.get("skills") or []
+                skills = skills if isinstance(skills, list) else [skills]
+                for skill in job.get("skills") or []:
+                    if skill not in skills:
+                        skills.append(skill)
+                kept["skills"] = skills
+        return list(merged.values())
+
     def write_mail(self, job_description, company_name, recipient_name, role_title, techstack_list,
-                   extracted_job_data=None):
+                   extracted_job_data=None, use_cache=True):
         """
         Enhanced email generation with dynamic content based on actual job data
         """
+        prompt_email, inputs = self._prepare_mail(job_description, company_name, recipient_name, role_title,
+                                                  techstack_list, extracted_job_data)
+        return self._invoke_cached(prompt_email, inputs, use_cache=use_cache, call="write_mail")
+
+    def stream_mail(self, job_description, company_name, recipient_name, role_title, techstack_list,
+                    extracted_job_data=None, use_cache=True):
+        """
+        Same as write_mail, but yields the email text chunk by chunk as it is generated.
+        Closing the generator early cancels the upstream request.
+        """
+        prompt_email, inputs = self._prepare_mail(job_description, company_name, recipient_name, role_title,
+                                                  techstack_list, extracted_job_data)
+        yield from self._stream_cached(prompt_email, inputs, use_cache=use_cache, call="write_mail")
+
+    def _prepare_mail(self, job_description, company_name, recipient_name, role_title, techstack_list,
+                      extracted_job_data=None):
+        """Input values for the email prompt; the variable sections share the MAIL_INPUT_TOKENS budget."""
 
         # Extract key information from the job data
         actual_role = extracted_job_data.get('role', role_title) if extracted_job_data else role_title
@@ -53,138 +196,41 @@ class Chain:
         # Create dynamic skill matching
         skill_matches = self._match_skills_to_portfolio(required_skills, techstack_list)
 
-        prompt_email = PromptTemplate.from_template(
-            """
-            ### INSTRUCTION:
-            You are an expert AI-powered career strategist. Compose a concise, high-impact cold email on behalf of Norul Islam (AI/ML Engineer). 
-            Write as Norul in a professional, confident tone that directly addresses the specific job requirements.
-
-            ### JOB-SPECIFIC INFORMATION:
-            Company Name: {company_name}
-            Recipient: {recipient_name}
-            Actual Job Role: {actual_role}
-            Required Skills: {required_skills}
-            Experience Level: {experience_level}
-            Job Description Summary: {job_desc_summary}
-
-            ### PORTFOLIO MATCHES:
-            {skill_matches}
-
-            ### CANDIDATE PROFILE:
-            Core Competency: AI/ML Engineering with full-stack & microservices strength. A builder who ideates and deploys.
-
-            Key Portfolio Assets:
-            - Multi-Agent / Agentic AI System (Planner, Architect, Coder agents generate web apps from one natural-language prompt)
-              Live Demo: https://huggingface.co/spaces/Jewelr16/Create_new_project
-            - AI Cold Email Generator (auto response from JD)
-              Live Demo: https://huggingface.co/spaces/Norul-islam/COLD-EMAIL-GENERATOR
-            - Document summary App 
-              Live Demo: https://money-forward-app.vercel.app/
-            - Full-Stack Microservices Project (scalable, resilient, decoupled)
-              GitHub: https://github.com/NORULISLAM/Micro-services
-            - Professional Web Development & Deployment
-              Corporate Site: https://yotsuba-system.co.jp/
-
-            ### EXECUTION REQUIREMENTS:
-            1. Analyze the ACTUAL job requirements from the extracted data
-            2. Map the TOP 3 most critical requirements to specific portfolio projects
-            3. Use the ACTUAL role title: "{actual_role}" throughout the email
-            4. Reference specific required skills: {required_skills}
-            5. Keep email concise: 150-220 words per language
-            6. Make it feel personalized to this specific job posting
-
-            ### OUTPUT FORMAT:
-            Generate both Japanese and English versions with the ACTUAL job role and requirements.
-
-            --- JAPANESE VERSION ---
-            件名: 貴社の{actual_role}募集への具体的提案：即戦力として貢献可能
-
-            {recipient_name} 様
-
-            {company_name} の「{actual_role}」に強い関心を持ち、即戦力として貢献できると確信しております。要点は以下の3点です。
-
-            【要件適合（上位3点）】
-            [Analyze the actual required skills: {required_skills} and map to portfolio]
-            1) [First major requirement]: 私の「Multi-Agent/Agentic AI（Planner/Architect/Coder）」の実装で、自然言語から自律的にWebアプリを生成。要件の根拠をライブで提示可能。
-            2) [Second major requirement]: Microservicesプロジェクトでスケーラブルな分散設計・観点を実装（耐障害性・独立デプロイ・疎結合）。
-            3) [Third major requirement]: フロント～インフラまで一気通貫（YSDコーポレートサイト構築・運用）、実務での品質・納期・継続改善。
-
-            【実績（ライブ）】
-            - 自律エージェント生成デモ：https://huggingface.co/spaces/Jewelr16/Create_new_project
-            - 自動メール応答（JD駆動）：https://huggingface.co/spaces/Norul-islam/COLD-EMAIL-GENERATOR
-            - 金融系フロント：https://money-forward-app.vercel.app/
-            - Microservices（コード）：https://github.com/NORULISLAM/Micro-services
-
-            最短15分でお打ち合わせの機会を頂ければ、要件と成果物の直結イメージを具体的にご説明いたします。ご検討を何卒よろしくお願い申し上げます。
-
-            何卒よろしくお願い申し上げます。
-            Norul Islam
-            GitHub: https://github.com/NORULISLAM
-
-            --- ENGLISH VERSION ---
-            Subject: Proposal for {company_name}'s {actual_role}: Direct skill-to-deliverable match
-
-            Dear {recipient_name},
-
-            I'm excited to apply for {company_name}'s "{actual_role}" position. Based on your specific requirements, I can contribute immediately:
-
-            [Top 3 Requirement Matches for {actual_role}]
-            [Map these specific skills to portfolio: {required_skills}]
-            1) [First key requirement]: My Multi-Agent/Agentic AI system (Planner/Architect/Coder) demonstrates autonomous development capabilities—turning natural language into working applications.
-            2) [Second key requirement]: Microservices project shows scalable, fault-tolerant architecture with independent deployability.
-            3) [Third key requirement]: Full-stack delivery experience from frontend to infrastructure, proven with corporate site development and maintenance.
-
-            [Live Proof]
-            - Agentic AI demo: https://huggingface.co/spaces/Jewelr16/Create_new_project
-            - JD-driven auto emailer: https://huggingface.co/spaces/Norul-islam/COLD-EMAIL-GENERATOR
-            - Document summary App: https://money-forward-app.vercel.app/
-            - Microservices code: https://github.com/NORULISLAM/Micro-services
-
-            May we schedule a 15-minute call? I'll demonstrate how my specific experience aligns with your {actual_role} requirements and show concrete deliverables.
-
-            Best regards,
-            Norul Islam
-            GitHub: https://github.com/NORULISLAM
-
-            ### IMPORTANT: 
-            - Replace [brackets] with actual analysis of the job requirements
-            - Use the actual role title "{actual_role}" consistently
-            - Reference the specific skills: {required_skills}
-            - Make this feel customized to this exact job posting
-            """
-        )
-
-        chain_email = prompt_email | self.llm
-        res = chain_email.invoke({
+        # Skills and matches first, the description gets whatever budget is left
+        fitted = fit_sections([
+            ("required_skills", ', '.join(required_skills) if required_skills else 'Not specified', 60),
+            ("skill_matches", skill_matches, 150),
+            ("job_desc_summary", str(job_desc_summary or 'Not available'), 120),
+        ], MAIL_INPUT_TOKENS)
+
+        return self.mail_prompt, {
             "company_name": company_name,
             "recipient_name": recipient_name,
             "actual_role": actual_role,
-            "required_skills": ', '.join(required_skills) if required_skills else 'Not specified',
             "experience_level": experience_level,
-            "job_desc_summary": job_desc_summary[:500] + "..." if len(job_desc_summary) > 500 else job_desc_summary,
-            "skill_matches": skill_matches
-        })
-        return res.content
+            **fitted,
+        }
 
     def _match_skills_to_portfolio(self, required_skills, techstack_list):
         """
         Create a mapping between required skills and portfolio techstack
+        (ranked lookups in the precomputed SkillIndex; techstack_list hits are listed as a fallback)
         """
-        if not required_skills or not techstack_list:
+        if not required_skills:
             return "No specific skill matches found in portfolio."
 
         matches = []
-        for skill in required_skills:
-            skill_lower = skill.lower()
-            for tech in techstack_list:
-                if skill_lower in tech.lower() or tech.lower() in skill_lower:
-                    matches.append(f"- {skill} → Portfolio experience: {tech}")
-                    break
+        for skill, ranked in self.skill_index.match_all(required_skills, limit=2).items():
+            tech, score = ranked[0]
+            also = f" (also: {ranked[1][0]})" if len(ranked) > 1 else ""
+            matches.append(f"- {skill} → Portfolio experience: {tech}{also} [match {score:.2f}]")
 
         if matches:
             return "SKILL MATCHING:\n" + "\n".join(matches)
-        else:
+        elif techstack_list:
             return f"Portfolio techstack available: {', '.join(techstack_list[:5])}"
+        else:
+            return "No specific skill matches found in portfolio."
 
 
 if __name__ == "__main__":
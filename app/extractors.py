@@ -0,0 +1,161 @@
+"""
+Structured-data fast path for job extraction.
+
+Most ATS pages (Greenhouse, Lever, Workday, ...) embed the posting as JSON-LD `JobPosting`
+or in a Next.js `__NEXT_DATA__` blob. Registered extractors parse those directly into the
+same `role` / `experience` / `skills` / `description` dicts that Chain.extract_jobs returns,
+so the LLM is only needed when no extractor matches.
+"""
+import json
+import re
+from html import unescape
+
+import lxml.html
+
+import telemetry
+from skills import default_skill_index
+
+_EXTRACTORS = []
+
+
+def register_extractor(fn):
+    """Decorator: fn(url, doc) -> list of job dicts, or None/[] when it does not apply."""
+    _EXTRACTORS.append(fn)
+    return fn
+
+
+def extract_structured(url, html):
+    """Run the registered extractors in order; returns (jobs, extractor_name) or (None, None)."""
+    if not html:
+        return None, None
+    with telemetry.span("structured_extract", url=url) as record:
+        try:
+            doc = lxml.html.fromstring(html)
+        except (ValueError, lxml.etree.ParserError):
+            return None, None
+        for extractor in _EXTRACTORS:
+            try:
+                jobs = extractor(url, doc)
+            except Exception:
+                continue  # a broken blob on one page should never break the pipeline
+            if jobs:
+                record.update(extractor=extractor.__name__, jobs=len(jobs))
+                return jobs, extractor.__name__
+        return None, None
+
+
+# --- helpers -------------------------------------------------------------
+
+def _html_to_text(value):
+    if not value:
+        return ""
+    # some ATS APIs ship the description entity-escaped ("&lt;p&gt;..."): unescape before the markup check
+    value = unescape(str(value))
+    if "<" in value:
+        try:
+            value = lxml.html.fromstring(value).text_content()
+        except (ValueError, lxml.etree.ParserError):
+            pass
+    return " ".join(value.split())
+
+
+def _skills_from(value, description):
+    if isinstance(value, str):
+        skills = [s.strip() for s in re.split(r"[,;\n•]", _html_to_text(value)) if s.strip()]
+    elif isinstance(value, list):
+        skills = [_html_to_text(s.get("name") if isinstance(s, dict) else s) for s in value]
+        skills = [s for s in skills if s]
+    else:
+        skills = []
+    if not skills and description:
+        skills = default_skill_index().find_in_text(description)
+    return skills[:20]
+
+
+def _experience_from(value):
+    if isinstance(value, dict):
+        months = value.get("monthsOfExperience")
+        if months:
+            try:
+                return f"{int(float(months)) // 12}+ years"
+            except (TypeError, ValueError):
+                pass
+        return _html_to_text(value.get("description")) or "Not specified"
+    return _html_to_text(value) or "Not specified"
+
+
+def _job_from_posting(posting):
+    description = _html_to_text(posting.get("description"))
+    role = _html_to_text(posting.get("title") or posting.get("name"))
+    if not role:
+        return None
+    return {
+        "role": role,
+        "experience": _experience_from(posting.get("experienceRequirements")),
+        "skills": _skills_from(posting.get("skills"), description),
+        "description": description,
+    }
+
+
+def _walk(node):
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from _walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk(value)
+
+
+def _is_job_posting(node):
+    kind = node.get("@type")
+    return kind == "JobPosting" or (isinstance(kind, list) and "JobPosting" in kind)
+
+
+# Keys that only job objects carry; a CMS block ("Our culture", "Benefits") has a title and body too
+_JOB_KEYS = ("employmentType", "employment_type", "jobLocation", "location", "datePosted", "department",
+             "departments", "team", "salary", "baseSalary", "applyUrl", "apply_url", "requisitionId")
+
+
+def _looks_like_job(node):
+    body = node.get("description") or node.get("content")
+    return (isinstance(node.get("title"), str) and isinstance(body, str) and len(body) > 200
+            and any(node.get(key) for key in _JOB_KEYS))
+
+
+# --- extractors ----------------------------------------------------------
+
+@register_extractor
+def json_ld_job_posting(url, doc):
+    """schema.org JobPosting in <script type="application/ld+json"> (Greenhouse, Lever, most ATSs)."""
+    jobs = []
+    for script in doc.xpath('//script[@type="application/ld+json"]/text()'):
+        try:
+            data = json.loads(script)
+        except ValueError:
+            continue
+        for node in _walk(data):
+            if _is_job_posting(node):
+                job = _job_from_posting(node)
+                if job:
+                    jobs.append(job)
+    return jobs
+
+
+@register_extractor
+def next_data_job_posting(url, doc):
+    """Next.js pages: job objects inside <script id="__NEXT_DATA__">."""
+    scripts = doc.xpath('//script[@id="__NEXT_DATA__"]/text()')
+    if not scripts:
+        return None
+    data = json.loads(scripts[0])
+    jobs, seen = [], set()
+    for node in _walk(data.get("props", data)):
+        if _is_job_posting(node) or _looks_like_job(node):
+            if "description" not in node and "content" in node:
+                node = dict(node, description=node["content"])
+            job = _job_from_posting(node)
+            if job and (job["role"], job["description"][:200]) not in seen:
+                seen.add((job["role"], job["description"][:200]))
+                jobs.append(job)
+    return jobs
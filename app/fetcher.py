@@ -0,0 +1,206 @@
+"""
+Shared HTTP fetch layer: one keep-alive connection pool for the process, per-host concurrency
+and politeness limits, and conditional requests (ETag / Last-Modified) backed by a local cache.
+
+Bodies are streamed: at most HTTP_MAX_BYTES are read (the rest of the page is cut off) and HTML is
+parsed to text while it arrives, so a huge page costs a bounded amount of memory.
+"""
+import codecs
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache import LLMCache
+from singleflight import SingleFlight
+from utils import HtmlTextExtractor, html_to_text
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "20"))
+HOST_CONCURRENCY = int(os.getenv("HTTP_HOST_CONCURRENCY", "4"))
+HOST_MIN_INTERVAL = float(os.getenv("HTTP_HOST_MIN_INTERVAL", "0.2"))  # seconds between requests to one host
+HTTP_CACHE_PATH = os.getenv("HTTP_CACHE_PATH", "/tmp/.cache/coldmail/http_cache.sqlite")
+HTTP_MAX_BYTES = int(os.getenv("HTTP_MAX_BYTES", str(5 * 1024 * 1024)))  # larger bodies are cut off
+CHUNK_SIZE = 64 * 1024
+SNIFF_BYTES = 4096  # how far into an HTML body a <meta charset> is looked for
+
+# <meta charset="..."> and <meta http-equiv="Content-Type" content="text/html; charset=...">
+_META_CHARSET = re.compile(rb"""<meta[^>]*?charset\s*=\s*["']?\s*([A-Za-z0-9._:-]+)""", re.IGNORECASE)
+
+
+@dataclass
+class Page:
+    url: str
+    status: int
+    content_type: str
+    html: str
+    text: str
+    from_cache: bool = False
+    truncated: bool = False  # the body was cut off at HTTP_MAX_BYTES
+
+
+def page_text(body, content_type):
+    """Pick the parsing strategy from the response's content type."""
+    if "json" in content_type:
+        try:
+            return json.dumps(json.loads(body), ensure_ascii=False)
+        except ValueError:
+            return body
+    if "html" in content_type or "xml" in content_type or body.lstrip()[:1] == "<":
+        return html_to_text(body)
+    return body
+
+
+def charset(content_type):
+    """The charset parameter of a Content-Type header, if Python knows it (None otherwise)."""
+    for param in content_type.split(";")[1:]:
+        name, _, value = param.partition("=")
+        if name.strip() == "charset":
+            try:
+                return codecs.lookup(value.strip().strip("'\"")).name
+            except LookupError:
+                return None
+    return None
+
+
+def meta_charset(head):
+    """The charset declared by a <meta> tag in the first bytes of an HTML document, if Python knows it."""
+    match = _META_CHARSET.search(head[:SNIFF_BYTES])
+    if match:
+        try:
+            return codecs.lookup(match.group(1).decode("ascii")).name
+        except LookupError:
+            pass
+    return None
+
+
+def read_body(response, content_type, max_bytes=None):
+    """
+    Stream a response body; returns (body, text, truncated). Reading stops after `max_bytes`
+    (HTTP_MAX_BYTES), and HTML is decoded and fed to the text extractor chunk by chunk instead
+    of being parsed in one piece after the download.
+    """
+    max_bytes = HTTP_MAX_BYTES if max_bytes is None else max_bytes
+    extractor = HtmlTextExtractor() if ("html" in content_type or "xml" in content_type) else None
+    chunks = response.iter_content(CHUNK_SIZE)
+    encoding = charset(content_type)
+    if encoding is None and extractor is not None:
+        # no charset in the header: like a browser, look for a <meta> declaration before decoding
+        head = b""
+        for chunk in chunks:
+            head += chunk
+            if len(head) >= SNIFF_BYTES:
+                break
+        encoding = meta_charset(head)
+        chunks = itertools.chain([head], chunks)
+    decoder = codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+    parts, size, truncated = [], 0, False
+    for chunk in chunks:
+        if max_bytes and size + len(chunk) > max_bytes:
+            chunk = chunk[:max_bytes - size]
+            truncated = True
+        size += len(chunk)
+        part = decoder.decode(chunk)
+        parts.append(part)
+        if extractor is not None:
+            extractor.feed(part)
+        if truncated:
+            break  # early cutoff: the rest is never downloaded
+    parts.append(decoder.decode(b"", final=True))
+    body = "".join(parts)
+    del parts
+    text = extractor.close() if extractor is not None else page_text(body, content_type)
+    return body, text, truncated
+
+
+class Fetcher:
+    def __init__(self, pool_size=32, host_concurrency=None, host_min_interval=None, cache=None, max_bytes=None):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = os.getenv("USER_AGENT", "Mozilla/5.0")
+
+        self.host_concurrency = host_concurrency or HOST_CONCURRENCY
+        self.host_min_interval = HOST_MIN_INTERVAL if host_min_interval is None else host_min_interval
+        self.max_bytes = HTTP_MAX_BYTES if max_bytes is None else max_bytes
+        self.cache = cache if cache is not None else LLMCache(
+            path=HTTP_CACHE_PATH,
+            ttl=0,  # validators decide freshness, not age
+            enabled=os.getenv("HTTP_CACHE_DISABLED", "").lower() not in ("1", "true", "yes"),
+        )
+        self._lock = threading.Lock()
+        self._host_slots = {}
+        self._host_last = {}
+        self.inflight = SingleFlight("fetch")
+
+    def _host_slot(self, host):
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.host_concurrency)
+            return self._host_slots[host]
+
+    def _polite_wait(self, host):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._host_last.get(host, 0.0) + self.host_min_interval)
+            self._host_last[host] = start
+        if start > now:
+            time.sleep(start - now)
+
+    def fetch(self, url, timeout=None):
+        """
+        Download `url` once (or revalidate it against the cache) and return a Page.
+        Concurrent fetches of the same URL (e.g. several sessions on one posting) share one request.
+        """
+        return self.inflight.do(url, self._fetch, url, timeout)
+
+    def _fetch(self, url, timeout=None):
+        key = self.cache.make_key("GET", url)
+        cached = self.cache.get(key)
+        cached = json.loads(cached) if cached else None
+
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        host = urlsplit(url).netloc
+        with self._host_slot(host):
+            self._polite_wait(host)
+            with self.session.get(url, headers=headers, timeout=timeout or HTTP_TIMEOUT, stream=True) as r:
+                if r.status_code == 304 and cached:
+                    return Page(url, 200, cached["content_type"], cached["body"],
+                                page_text(cached["body"], cached["content_type"]), from_cache=True)
+                r.raise_for_status()
+                content_type = r.headers.get("Content-Type", "").lower()
+                body, text, truncated = read_body(r, content_type, self.max_bytes)
+
+        if not truncated and (r.headers.get("ETag") or r.headers.get("Last-Modified")):
+            self.cache.set(key, json.dumps({
+                "etag": r.headers.get("ETag"),
+                "last_modified": r.headers.get("Last-Modified"),
+                "content_type": content_type,
+                "body": body,
+            }, ensure_ascii=False))
+        return Page(url, r.status_code, content_type, body, text, truncated=truncated)
+
+    def fetch_many(self, urls, max_workers=16):
+        """Fetch many URLs concurrently; yields (url, Page | Exception) in completion order."""
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch") as pool:
+            futures = {pool.submit(self.fetch, url): url for url in urls}
+            for fut in as_completed(futures):
+                try:
+                    yield futures[fut], fut.result()
+                except Exception as e:
+                    yield futures[fut], e
+
@@ -0,0 +1,153 @@
+import contextvars
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import telemetry
+
+# Tunables (override via env for the deployed container)
+DEFAULT_CONCURRENCY = int(os.getenv("GEN_CONCURRENCY", "4"))
+DEFAULT_TIMEOUT = float(os.getenv("GEN_TIMEOUT", "120"))
+
+
+@dataclass
+class JobResult:
+    """Outcome of the techstack lookup + email generation for one extracted job."""
+    index: int
+    job: dict
+    role: str
+    jd_block: str = ""
+    techstack: list = field(default_factory=list)
+    email: str = ""
+    techstack_error: Exception | None = None
+    error: Exception | None = None
+
+
+@dataclass
+class JobChunk:
+    """A piece of email text streamed for job `index` (only emitted when streaming)."""
+    index: int
+    role: str
+    text: str
+
+
+class Cancelled(Exception):
+    pass
+
+
+def build_jd_block(job):
+    """Build a rich JD block for the prompt."""
+    return (
+        f"Role: {job.get('role', 'N/A')}\n"
+        f"Experience: {job.get('experience', 'N/A')}\n"
+        f"Skills: {', '.join(job.get('skills', []))}\n"
+        f"Description: {job.get('description', 'N/A')}"
+    )
+
+
+class GenerationEngine:
+    """
+    Fan the per-job work (portfolio query + write_mail) out over a bounded thread pool.
+    Events are yielded as they happen; callers use .index to keep page order.
+    """
+
+    def __init__(self, chain, portfolio, max_workers=None, timeout=None, use_cache=True):
+        self.chain = chain
+        self.portfolio = portfolio
+        self.use_cache = use_cache
+        self.max_workers = max(1, max_workers or DEFAULT_CONCURRENCY)
+        self.timeout = timeout or DEFAULT_TIMEOUT
+
+    def _run_one(self, events, started, cancelled, stream, index, job, role, company, recipient,
+                 techstack, techstack_error):
+        started[index] = time.monotonic()
+        result = JobResult(index=index, job=job, role=role, jd_block=build_jd_block(job),
+                           techstack=techstack, techstack_error=techstack_error)
+        try:
+            if index in cancelled:
+                raise Cancelled()
+
+            mail_kwargs = dict(
+                job_description=result.jd_block,
+                company_name=company,
+                recipient_name=recipient,
+                role_title=role,
+                techstack_list=result.techstack,
+                extracted_job_data=job,
+                use_cache=self.use_cache
+            )
+            with telemetry.span("write_mail", job=index, role=role, stream=stream):
+                if not stream:
+                    result.email = self.chain.write_mail(**mail_kwargs)
+                else:
+                    parts = []
+                    chunks = self.chain.stream_mail(**mail_kwargs)
+                    try:
+                        for text in chunks:
+                            if index in cancelled:
+                                raise Cancelled()
+                            parts.append(text)
+                            events.put(JobChunk(index=index, role=role, text=text))
+                    finally:
+                        chunks.close()  # stops the upstream request if we bailed out early
+                    result.email = "".join(parts)
+        except Cancelled:
+            return
+        except Exception as e:
+            result.error = e
+        events.put(result)
+
+    def generate(self, jobs, company, recipient, role, auto_update_role=True, stream=False):
+        """
+        Yield JobChunk events (when `stream`) and one JobResult per job, in completion order.
+        Closing the generator early cancels the jobs that are still queued or streaming.
+        """
+        # One vectorized portfolio lookup for every job on the page (top skills as cues)
+        techstack_error = None
+        try:
+            techstacks = self.portfolio.query_techstack_batch(
+                [(job.get("skills") or [])[:8] for job in jobs], n_results=8
+            )
+        except Exception as e:
+            techstacks, techstack_error = [[] for _ in jobs], e
+
+        events = queue.Queue()
+        started, cancelled = {}, set()
+        remaining = {}
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="mail")
+        try:
+            for i, job in enumerate(jobs):
+                current_role = job.get("role") if auto_update_role and job.get("role") else role
+                remaining[i] = (job, current_role)
+                executor.submit(contextvars.copy_context().run, self._run_one, events, started, cancelled, stream,
+                                i, job, current_role, company, recipient, techstacks[i], techstack_error)
+
+            while remaining:
+                now = time.monotonic()
+                deadlines = [started[i] + self.timeout for i in remaining if i in started]
+                wait_for = max(0.0, min(deadlines) - now) if deadlines else self.timeout
+                try:
+                    event = events.get(timeout=wait_for)
+                except queue.Empty:
+                    event = None
+
+                if event is not None and event.index in remaining:
+                    if isinstance(event, JobResult):
+                        remaining.pop(event.index)
+                    yield event
+
+                # Give up on calls that have been running longer than the per-request timeout
+                now = time.monotonic()
+                for i, (job, current_role) in list(remaining.items()):
+                    if i in started and now - started[i] >= self.timeout:
+                        remaining.pop(i)
+                        cancelled.add(i)
+                        yield JobResult(
+                            index=i, job=job, role=current_role, jd_block=build_jd_block(job),
+                            error=TimeoutError(f"Email generation timed out after {self.timeout:.0f}s")
+                        )
+        finally:
+            cancelled.update(remaining)
+            executor.shutdown(wait=False, cancel_futures=True)
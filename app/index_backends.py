@@ -0,0 +1,238 @@
+"""
+Vector index backends for Portfolio.
+
+A backend stores (id, document, embedding) rows and answers nearest-neighbour queries:
+
+    ids() -> set[str]
+    upsert(ids, documents, embeddings)
+    delete(ids)
+    query(embeddings, n_results) -> list[list[str]]   # documents, best first, one list per query
+    count() -> int
+    save()                                            # no-op for backends that persist on their own
+    refresh()                                         # re-read a persisted index another process changed
+
+Portfolio computes the embeddings itself, so backends never load a model.
+"""
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+
+class HashingEmbedder:
+    """
+    Dependency-free embedder: hashed word + character n-gram counts, L2-normalized.
+    Plenty for matching short Techstack strings, and loads in microseconds (no onnxruntime).
+    """
+    name = "hashing-v1"
+
+    def __init__(self, dim=512):
+        self.dim = dim
+
+    def _features(self, text):
+        text = text.lower()
+        for word in re.findall(r"[\w+#.]+", text):
+            yield "w:" + word
+            padded = f" {word} "
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3]
+
+    def __call__(self, input):
+        out = np.zeros((len(input), self.dim), dtype=np.float32)
+        for row, text in enumerate(input):
+            for feature in self._features(text):
+                h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                out[row, h % self.dim] += 1.0 if feature.startswith("w:") else 0.5
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms == 0, 1, norms)
+
+
+class NumpyBackend:
+    """
+    In-process index: normalized float32 vectors, dot-product top-k via argpartition. Vectors are
+    kept as a list of row blocks (one per upsert) that are never concatenated, so building the
+    index batch by batch does not copy it. With `persist_dir` the vectors are saved as one .npy
+    file and re-opened memory-mapped.
+    """
+
+    def __init__(self, persist_dir=None, embedder_name=""):
+        self.persist_dir = persist_dir
+        self.embedder_name = embedder_name
+        self._ids, self._docs = [], []
+        self._blocks = []
+        if persist_dir:
+            self._load()
+
+    def _paths(self):
+        return (os.path.join(self.persist_dir, "portfolio_vectors.npy"),
+                os.path.join(self.persist_dir, "portfolio_index.json"))
+
+    def _load(self):
+        vectors_path, meta_path = self._paths()
+        if not (os.path.exists(vectors_path) and os.path.exists(meta_path)):
+            return
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("embedder") != self.embedder_name:
+            return  # built with another embedder: start over
+        self._ids, self._docs = meta["ids"], meta["documents"]
+        self._blocks = [np.load(vectors_path, mmap_mode="r")] if self._ids else []
+
+    def refresh(self):
+        if self.persist_dir:
+            self._ids, self._docs, self._blocks = [], [], []
+            self._load()
+
+    def save(self):
+        if not self.persist_dir:
+            return
+        os.makedirs(self.persist_dir, exist_ok=True)
+        vectors_path, meta_path = self._paths()
+        # per-process temp files: other workers may have the old files mapped, or be saving too
+        vectors_tmp, meta_tmp = f"{vectors_path}.{os.getpid()}.tmp.npy", f"{meta_path}.{os.getpid()}.tmp"
+        dim = self._blocks[0].shape[1] if self._blocks else 0
+        # written block by block into a memory-mapped file: the index is never copied in memory
+        out = np.lib.format.open_memmap(vectors_tmp, mode="w+", dtype=np.float32, shape=(len(self._ids), dim))
+        row = 0
+        for block in self._blocks:
+            out[row:row + len(block)] = block
+            row += len(block)
+        out.flush()
+        del out
+        os.replace(vectors_tmp, vectors_path)
+        with open(meta_tmp, "w", encoding="utf-8") as f:
+            json.dump({"embedder": self.embedder_name, "ids": self._ids, "documents": self._docs}, f)
+        os.replace(meta_tmp, meta_path)
+        self._blocks = [np.load(vectors_path, mmap_mode="r")] if self._ids else []
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def ids(self):
+        return set(self._ids)
+
+    def count(self):
+        return len(self._ids)
+
+    def nbytes(self):
+        """Memory held by the vectors (mapped pages included)."""
+        return sum(block.nbytes for block in self._blocks)
+
+    def upsert(self, ids, documents, embeddings):
+        if not ids:
+            return
+        present = set(self._ids)
+        self.delete([i for i in ids if i in present])
+        self._blocks.append(self._normalize(embeddings))
+        self._ids.extend(ids)
+        self._docs.extend(documents)
+
+    def delete(self, ids):
+        drop = set(ids)
+        if not drop:
+            return
+        keep = np.fromiter((i not in drop for i in self._ids), dtype=bool, count=len(self._ids))
+        blocks, row = [], 0
+        for block in self._blocks:
+            mask = keep[row:row + len(block)]
+            row += len(block)
+            if mask.all():
+                blocks.append(block)
+            elif mask.any():
+                blocks.append(np.ascontiguousarray(np.asarray(block)[mask]))
+        self._blocks = blocks
+        self._ids = [i for i, k in zip(self._ids, keep) if k]
+        self._docs = [d for d, k in zip(self._docs, keep) if k]
+
+    def query(self, embeddings, n_results):
+        if not self._ids:
+            return [[] for _ in embeddings]
+        k = min(n_results, len(self._ids))
+        queries = self._normalize(embeddings)
+        scores = np.concatenate([queries @ block.T for block in self._blocks], axis=1)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        out = []
+        for row, cols in zip(scores, top):
+            cols = cols[np.argsort(-row[cols])]
+            out.append([self._docs[c] for c in cols])
+        return out
+
+
+class ChromaBackend:
+    """Chroma collection (in-memory, or PersistentClient when `persist_dir` is set)."""
+
+    def __init__(self, persist_dir=None):
+        self.persist_dir = persist_dir
+        self.client, self.collection = self._open()
+
+    def _open(self):
+        import chromadb
+        from chromadb.config import Settings
+
+        if self.persist_dir:
+            client = chromadb.PersistentClient(path=self.persist_dir, settings=Settings(anonymized_telemetry=False))
+        else:
+            # FREE deploy: in-memory DB (no filesystem writes) + no telemetry
+            client = chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False))
+        return client, client.get_or_create_collection(name="portfolio", embedding_function=None)
+
+    def ids(self):
+        return set(self.collection.get(include=[])["ids"])
+
+    def count(self):
+        return self.collection.count()
+
+    def upsert(self, ids, documents, embeddings):
+        if ids:
+            # No metadatas field at all
+            self.collection.upsert(ids=ids, documents=documents,
+                                   embeddings=[np.asarray(e, dtype=np.float32).tolist() for e in embeddings])
+
+    def delete(self, ids):
+        if ids:
+            self.collection.delete(ids=list(ids))
+
+    def query(self, embeddings, n_results):
+        res = self.collection.query(
+            query_embeddings=[np.asarray(e, dtype=np.float32).tolist() for e in embeddings],
+            n_results=n_results,
+            include=["documents"],
+        )
+        return res.get("documents") or [[] for _ in embeddings]
+
+    def save(self):
+        pass  # PersistentClient writes through
+
+    def refresh(self):
+        if not self.persist_dir:
+            return
+        from chromadb.api.client import SharedSystemClient
+
+        # Chroma keeps one system per directory and process, and its in-memory HNSW index never sees
+        # rows that another process added: open the directory again (the old client is left to the
+        # queries still running on it)
+        SharedSystemClient.clear_system_cache()
+        self.client, self.collection = self._open()
+
+
+def default_embedding_function(backend_name):
+    """ONNX MiniLM (Chroma's default) for the chroma backend, the hashing embedder for numpy."""
+    if os.getenv("PORTFOLIO_EMBEDDER", "onnx" if backend_name == "chroma" else "hashing") == "hashing":
+        return HashingEmbedder()
+    from chromadb.utils import embedding_functions
+    return embedding_functions.DefaultEmbeddingFunction()
+
+
+def make_backend(name, persist_dir=None, embedder_name=""):
+    if name == "numpy":
+        return NumpyBackend(persist_dir=persist_dir, embedder_name=embedder_name)
+    if name == "chroma":
+        return ChromaBackend(persist_dir=persist_dir)
+    raise ValueError(f"Unknown portfolio index backend: {name!r} (expected 'chroma' or 'numpy')")
@@ -0,0 +1,229 @@
+"""
+SQLite-backed task queue shared by the Streamlit UI and the worker processes (worker.py).
+
+The UI submit()s a task and follows its events(); workers claim() queued tasks, append events while
+they run and finish() or fail() them. Everything lives in one SQLite file (JOB_QUEUE_PATH), so a
+browser reload, or a second tab, can pick a task up again by its id.
+
+A claimed task is leased to its worker for JOB_LEASE seconds and the worker renews the lease with
+heartbeat(). If a worker dies, its task is handed to another worker once the lease runs out (up to
+JOB_MAX_ATTEMPTS times).
+"""
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+import uuid
+
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "/tmp/.cache/coldmail/jobs.sqlite")
+JOB_LEASE = float(os.getenv("JOB_LEASE", "60"))  # seconds
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", str(24 * 3600)))  # finished tasks are purged after this
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = frozenset({DONE, FAILED, CANCELLED})
+
+# Lower runs first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+
+class TaskError(Exception):
+    """An error raised in a worker, carried back to the UI with the worker's traceback text."""
+
+    def __init__(self, message, remote_traceback=""):
+        super().__init__(message)
+        self.remote_traceback = remote_traceback
+
+
+class JobQueue:
+    def __init__(self, path=None, lease=None, max_attempts=None):
+        self.path = path or JOB_QUEUE_PATH
+        self.lease = JOB_LEASE if lease is None else lease
+        self.max_attempts = JOB_MAX_ATTEMPTS if max_attempts is None else max_attempts
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _db(self):
+        if self._conn is None:
+            if self.path != ":memory:":
+                pathlib.Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            # several processes write to this file: wait for the lock instead of failing
+            self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS tasks ("
+                " id TEXT PRIMARY KEY, kind TEXT NOT NULL, params TEXT NOT NULL, dedupe_key TEXT,"
+                " status TEXT NOT NULL, priority INTEGER NOT NULL, attempts INTEGER NOT NULL DEFAULT 0,"
+                " worker TEXT, lease_until REAL, result TEXT, error TEXT,"
+                " created REAL NOT NULL, started REAL, finished REAL);"
+                "CREATE INDEX IF NOT EXISTS tasks_ready ON tasks(status, priority, created);"
+                "CREATE INDEX IF NOT EXISTS tasks_dedupe ON tasks(dedupe_key, status);"
+                "CREATE TABLE IF NOT EXISTS task_events ("
+                " task_id TEXT NOT NULL, seq INTEGER NOT NULL, attempt INTEGER NOT NULL, type TEXT NOT NULL,"
+                " data TEXT NOT NULL, created REAL NOT NULL, PRIMARY KEY (task_id, seq));"
+            )
+        return self._conn
+
+    def _write(self, fn):
+        """Run fn(db) in one IMMEDIATE transaction (serialized across processes)."""
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                out = fn(db)
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+            return out
+
+    @staticmethod
+    def _row(row):
+        if row is None:
+            return None
+        keys = ("id", "kind", "params", "dedupe_key", "status", "priority", "attempts", "worker", "lease_until",
+                "result", "error", "created", "started", "finished")
+        task = dict(zip(keys, row))
+        task["params"] = json.loads(task["params"])
+        task["result"] = json.loads(task["result"]) if task["result"] else None
+        task["error"] = json.loads(task["error"]) if task["error"] else None
+        return task
+
+    # --- UI side --------------------------------------------------------
+
+    def submit(self, kind, params, priority=PRIORITY_INTERACTIVE, dedupe_key=None):
+        """
+        Queue a task and return its id. With `dedupe_key`, an identical task that is still queued or
+        running is joined instead (several tabs submitting the same URL share one run).
+        """
+        def tx(db):
+            if dedupe_key:
+                row = db.execute("SELECT id FROM tasks WHERE dedupe_key = ? AND status IN (?, ?)"
+                                 " ORDER BY created DESC LIMIT 1", (dedupe_key, QUEUED, RUNNING)).fetchone()
+                if row:
+                    return row[0]
+            task_id = uuid.uuid4().hex[:12]
+            db.execute("INSERT INTO tasks (id, kind, params, dedupe_key, status, priority, created)"
+                       " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                       (task_id, kind, json.dumps(params, ensure_ascii=False), dedupe_key, QUEUED, priority,
+                        time.time()))
+            return task_id
+        return self._write(tx)
+
+    def get(self, task_id):
+        with self._lock:
+            row = self._db().execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return self._row(row)
+
+    def events(self, task_id, after=0, min_attempt=0):
+        """
+        [(seq, attempt, type, data)] appended after `after`, in order. seq keeps growing across attempts:
+        when a task is taken over after its worker died, the new attempt's events follow the old ones.
+        """
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT seq, attempt, type, data FROM task_events WHERE task_id = ? AND seq > ? AND attempt >= ?"
+                " ORDER BY seq", (task_id, after, min_attempt)).fetchall()
+        return [(seq, attempt, kind, json.loads(data)) for seq, attempt, kind, data in rows]
+
+    def cancel(self, task_id):
+        """Cancel a queued task, or ask the worker running it to stop (see heartbeat())."""
+        def tx(db):
+            db.execute("UPDATE tasks SET status = ?, finished = ? WHERE id = ? AND status IN (?, ?)",
+                       (CANCELLED, time.time(), task_id, QUEUED, RUNNING))
+        self._write(tx)
+
+    def position(self, task_id):
+        """Number of queued tasks that run before this one (0 when it is next or already running)."""
+        with self._lock:
+            row = self._db().execute(
+                "SELECT COUNT(*) FROM tasks t, tasks me WHERE me.id = ? AND me.status = ? AND t.status = ?"
+                " AND (t.priority < me.priority OR (t.priority = me.priority AND t.created < me.created))",
+                (task_id, QUEUED, QUEUED)).fetchone()
+        return row[0]
+
+    # --- worker side ----------------------------------------------------
+
+    def claim(self, worker):
+        """Lease the next runnable task to `worker` (queued, or running with an expired lease); None if idle."""
+        def tx(db):
+            now = time.time()
+            while True:
+                row = db.execute(
+                    "SELECT id, attempts FROM tasks WHERE status = ? OR (status = ? AND lease_until < ?)"
+                    " ORDER BY priority, created LIMIT 1", (QUEUED, RUNNING, now)).fetchone()
+                if row is None:
+                    return None
+                task_id, attempts = row
+                if attempts >= self.max_attempts:
+                    # its workers keep dying on it: stop handing it out
+                    db.execute("UPDATE tasks SET status = ?, error = ?, finished = ? WHERE id = ?",
+                               (FAILED, json.dumps({"message": f"Gave up after {attempts} attempts", "traceback": ""}),
+                                now, task_id))
+                    continue
+                db.execute("UPDATE tasks SET status = ?, worker = ?, lease_until = ?, attempts = attempts + 1,"
+                           " started = COALESCE(started, ?) WHERE id = ?",
+                           (RUNNING, worker, now + self.lease, now, task_id))
+                return self._row(db.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone())
+        return self._write(tx)
+
+    def heartbeat(self, task_id, worker):
+        """Extend the lease; returns False when the task was cancelled or taken over (the worker should stop)."""
+        def tx(db):
+            cur = db.execute("UPDATE tasks SET lease_until = ? WHERE id = ? AND worker = ? AND status = ?",
+                             (time.time() + self.lease, task_id, worker, RUNNING))
+            return cur.rowcount == 1
+        return self._write(tx)
+
+    def emit(self, task_id, attempt, kind, data):
+        """Append an event of attempt number `attempt` (task["attempts"] of the claimed task)."""
+        def tx(db):
+            seq = db.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM task_events WHERE task_id = ?",
+                             (task_id,)).fetchone()[0]
+            db.execute("INSERT INTO task_events (task_id, seq, attempt, type, data, created)"
+                       " VALUES (?, ?, ?, ?, ?, ?)",
+                       (task_id, seq, attempt, kind, json.dumps(data, ensure_ascii=False, default=str),
+                        time.time()))
+        self._write(tx)
+
+    def drop_partials(self, task_id, index):
+        """Delete the streamed "partial" events of job `index` once its "result" event is written."""
+        self._write(lambda db: db.execute(
+            "DELETE FROM task_events WHERE task_id = ? AND type = 'partial' AND json_extract(data, '$.index') = ?",
+            (task_id, index)))
+
+    def finish(self, task_id, worker, result=None):
+        self._end(task_id, worker, DONE, result=result)
+
+    def fail(self, task_id, worker, message, remote_traceback=""):
+        self._end(task_id, worker, FAILED, error={"message": message, "traceback": remote_traceback})
+
+    def _end(self, task_id, worker, status, result=None, error=None):
+        def tx(db):
+            db.execute("UPDATE tasks SET status = ?, result = ?, error = ?, finished = ?, lease_until = NULL"
+                       " WHERE id = ? AND worker = ? AND status = ?",
+                       (status, json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+                        json.dumps(error, ensure_ascii=False) if error else None, time.time(), task_id, worker,
+                        RUNNING))
+        self._write(tx)
+
+    def purge(self, older_than=None):
+        """Delete finished tasks (and their events) older than `older_than` seconds (JOB_RETENTION)."""
+        cutoff = time.time() - (JOB_RETENTION if older_than is None else older_than)
+
+        def tx(db):
+            old = "SELECT id FROM tasks WHERE status IN (?, ?, ?) AND finished < ?"
+            args = (DONE, FAILED, CANCELLED, cutoff)
+            db.execute(f"DELETE FROM task_events WHERE task_id IN ({old})", args)
+            return db.execute("DELETE FROM tasks WHERE status IN (?, ?, ?) AND finished < ?", args).rowcount
+        return self._write(tx)
+
+    def stats(self):
+        with self._lock:
+            rows = self._db().execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+        counts = dict(rows)
+        return {status: counts.get(status, 0) for status in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
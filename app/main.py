@@ -1,16 +1,6 @@
 # Force writable caches BEFORE any other imports
 import os
 import pathlib
-import requests
-import streamlit as st
-from bs4 import BeautifulSoup
-from chains import Chain
-from langchain_community.document_loaders import WebBaseLoader
-from portfolio import Portfolio
-from utils import clean_text
-import traceback
-import json
-import re
 
 # Always override (not setdefault)
 os.environ["XDG_CACHE_HOME"] = "/tmp/.cache"
@@ -26,71 +16,216 @@ os.environ["CHROMA_TELEMETRY_IMPLEMENTATION"] = "none"
 for p in ("/tmp/.cache", "/tmp/hf", "/tmp/hf/transformers", "/tmp/hf/hub"):
     pathlib.Path(p).mkdir(parents=True, exist_ok=True)
 
+# Keep top-level imports light: the pipeline (langchain/Groq, Chroma/numpy, lxml, the fetcher) runs
+# in the worker processes (worker.py); this process only talks to the job queue.
+import hashlib
+import json
+import time
+import traceback
+
+import streamlit as st
+
+import telemetry
+from jobqueue import CANCELLED, FAILED, FINISHED, QUEUED
+from resources import get_job_queue
+from scraper import extract_company_from_url
+from worker import result_from_event, start_local_workers
+
 st.set_page_config(layout="wide", page_title="コールドメールジェネレーター", page_icon="📧")
 
+# Verbose st.write debug lines are slow to render on big pages; DEBUG_OUTPUT sets the checkbox default
+DEBUG_OUTPUT = os.getenv("DEBUG_OUTPUT", "1").lower() not in ("0", "false", "no")
+POLL_INTERVAL = float(os.getenv("UI_POLL_INTERVAL", "0.5"))  # seconds between task event polls
 
-def extract_company_from_url(url):
-    """Extract likely company name from URL"""
-    try:
-        # Extract domain and path patterns
-        if "greenhouse.io" in url:
-            # Pattern: job-boards.greenhouse.io/COMPANY/jobs/
-            match = re.search(r'greenhouse\.io/([^/]+)', url)
-            if match:
-                company = match.group(1).replace('-', ' ').title()
-                return company
-        elif "lever.co" in url:
-            # Pattern: jobs.lever.co/COMPANY/
-            match = re.search(r'lever\.co/([^/]+)', url)
-            if match:
-                company = match.group(1).replace('-', ' ').title()
-                return company
-        else:
-            # Try to extract from general URL patterns
-            match = re.search(r'://(?:www\.)?([^./]+)', url)
-            if match:
-                company = match.group(1).replace('-', ' ').title()
-                return company
-    except:
-        pass
-    return "Company, Inc."
 
+def _quiet(*args, **kwargs):
+    pass
 
-def fetch_text(url: str) -> str:
-    """Try LangChain loader first; if short/empty, fallback to requests+bs4."""
-    text = ""
-    st.write(f"🔍 Fetching text from: {url}")
 
-    try:
-        st.write("📥 Trying WebBaseLoader...")
-        loader = WebBaseLoader(
-            [url],
-            header_template={"User-Agent": os.getenv("USER_AGENT", "Mozilla/5.0")},
-        )
-        docs = loader.load()
-        if docs:
-            text = docs[0].page_content or ""
-            st.write(f"✅ WebBaseLoader succeeded: {len(text)} characters")
-    except Exception as e:
-        st.write(f"❌ WebBaseLoader failed: {str(e)}")
-        text = ""
+def verbose_enabled(debug):
+    return debug is not _quiet
+
+
+def format_error(error):
+    """Traceback text of an error (errors from a worker carry the worker's traceback)."""
+    return getattr(error, "remote_traceback", None) or "".join(traceback.format_exception(error))
 
-    # Fallback for JS-heavy/blocked pages
-    if len(text) < 800:
-        st.write("🔄 Trying fallback with requests + BeautifulSoup...")
-        try:
-            r = requests.get(url, headers={"User-Agent": os.getenv("USER_AGENT", "Mozilla/5.0")}, timeout=20)
-            r.raise_for_status()
-            soup = BeautifulSoup(r.text, "html.parser")
-            text = soup.get_text(" ", strip=True)
-            st.write(f"✅ Fallback succeeded: {len(text)} characters")
-        except Exception as e:
-            st.write(f"❌ Fallback also failed: {str(e)}")
 
-    return text
+def render_job_result(result, company, auto_update_role, debug=st.write, attempt=1):
+    """Render one finished JobResult into the current container."""
+    job = result.job
+    st.write(f"**Processing job {result.index + 1}:**")
 
+    if auto_update_role and job.get('role'):
+        st.info(f"🔄 Auto-updated role to: **{result.role}**")
 
-def create_streamlit_app(llm, portfolio, clean_text_fn):
+    debug("**Job Description Block:**")
+    if verbose_enabled(debug):
+        st.text(result.jd_block)
+
+    debug("**Querying portfolio for relevant techstack...**")
+    if result.techstack_error:
+        st.error(f"❌ Techstack query failed: {str(result.techstack_error)}")
+        debug(format_error(result.techstack_error))
+    else:
+        debug(f"Skills cues: {(job.get('skills') or [])[:8]}")
+        debug(f"Techstack hits found: {len(result.techstack)}")
+        if result.techstack and verbose_enabled(debug):
+            with st.expander("View matched techstack"):
+                for hit in result.techstack:
+                    st.write(f"- {hit}")
+
+    debug("**Generating personalized email...**")
+    if result.error:
+        st.error(f"❌ Email generation failed: {str(result.error)}")
+        debug(format_error(result.error))
+    else:
+        email = result.email
+        st.write("**Generated Email:**")
+        debug(f"Email length: {len(email) if email else 0} characters")
+
+        if email:
+            # Create expandable sections for better readability
+            with st.expander(f"📧 Email for {job.get('role', 'Unknown role')} (Click to expand)",
+                             expanded=True):
+                st.markdown("### Generated Email Content")
+                st.code(email, language="markdown")
+
+                # Add copy button functionality
+                st.download_button(
+                    label="💾 Download Email as Text",
+                    data=email,
+                    file_name=f"cold_email_{company}_{result.role.replace('/', '_')}.txt",
+                    mime="text/plain",
+                    key=f"download_{attempt}_{result.index}"  # a retried task redraws the job
+                )
+        else:
+            st.error("❌ Empty email generated!")
+
+    st.write("---")  # Separator between jobs
+
+
+def render_stage_timings(spans):
+    """Table of the spans recorded for one run (children finish first, so sort by start time)."""
+    rows = [
+        {
+            "stage": s["stage"],
+            "seconds": round(s["duration_s"], 3),
+            "status": s["status"],
+            "tokens (prompt/completion)": (f"{s['prompt_tokens']}/{s['completion_tokens']}"
+                                           if "prompt_tokens" in s else ""),
+            "detail": ", ".join(f"{k}={s[k]}" for k in ("call", "job", "cache_hit", "chunks", "bytes", "from_cache",
+                                                        "truncated", "embedded", "cached", "extractor") if k in s),
+        }
+        for s in sorted(spans, key=lambda s: s["start"])
+    ]
+    with st.expander("⏱️ Stage timings", expanded=False):
+        st.table(rows)
+
+
+class TaskView:
+    """Renders a task's events into the page; replaying the event log after a reload rebuilds the same page."""
+
+    def __init__(self, params, debug, attempt=1):
+        self.params = params
+        self.debug = debug
+        self.attempt = attempt
+        self.slots = []
+        self.live = {}
+        self.streamed = {}
+
+    def handle(self, kind, data):
+        debug = self.debug
+        if kind == "log":
+            (debug if data["debug"] else st.write)(data["text"])
+        elif kind == "warning":
+            st.warning(data["text"])
+            st.text_area(data["label"], data["preview"], height=180)
+        elif kind == "error":
+            st.error(data["text"])
+            debug(data["traceback"])
+        elif kind == "text":
+            if verbose_enabled(debug):
+                with st.expander("View processed text (first 1000 chars)"):
+                    st.text(data["preview"])
+        elif kind == "jobs":
+            jobs = data["jobs"]
+            if verbose_enabled(debug):
+                st.write("**Extracted jobs preview:**")
+                for i, job in enumerate(jobs):
+                    with st.expander(f"Job {i + 1}: {job.get('role', 'Unknown role')}"):
+                        st.json(job)
+            for i, job in enumerate(jobs):
+                slot = st.empty()
+                slot.info(f"⏳ Job {i + 1}: {job.get('role', 'Unknown role')} — waiting...")
+                self.slots.append(slot)
+        elif kind == "partial":
+            index = data["index"]
+            if index not in self.live:
+                with self.slots[index].container():
+                    st.write(f"**Processing job {index + 1}:** ✍️ generating...")
+                    with st.expander(f"📧 Email for {data['role']}", expanded=True):
+                        self.live[index] = st.empty()
+            self.streamed[index] = self.streamed.get(index, "") + data["text"]
+            self.live[index].code(self.streamed[index], language="markdown")
+        elif kind == "result":
+            result = result_from_event(data)
+            with self.slots[result.index].container():
+                render_job_result(result, self.params["company"], self.params["auto_update_role"], debug,
+                                  self.attempt)
+        elif kind == "spans":
+            render_stage_timings(data)
+
+
+def follow_task(queue, task_id, debug):
+    """Render task `task_id` from its event log, polling until it finishes (also after a reload)."""
+    task = queue.get(task_id)
+    if task is None:
+        st.warning(f"Task {task_id} was not found (finished tasks are kept for JOB_RETENTION seconds).")
+        return
+    if task["status"] not in FINISHED and st.button("⏹️ Cancel", key=f"cancel_{task_id}"):
+        queue.cancel(task_id)
+
+    status = st.empty()
+    page = st.empty()
+    area = page.container()
+    # events of attempts before the current one belong to a worker that died half-way: never shown
+    seq, attempt = 0, max(task["attempts"], 1)  # a queued task has not been claimed yet (attempts 0)
+    view = TaskView(task["params"], debug, attempt)
+    while True:
+        # read the status before the events: once it is final, every event has been written
+        task = queue.get(task_id)
+        for seq, event_attempt, kind, data in queue.events(task_id, after=seq, min_attempt=attempt):
+            if event_attempt > attempt:
+                # taken over by another worker, which starts from scratch: so does the page
+                attempt = event_attempt
+                page.empty()
+                page = st.empty()
+                area = page.container()
+                view = TaskView(task["params"], debug, attempt)
+                with area:
+                    st.info(f"🔁 Worker restarted — retrying (attempt {attempt})")
+            with area:
+                view.handle(kind, data)
+        if task["status"] in FINISHED:
+            break
+        if task["status"] == QUEUED:
+            status.info(f"⏳ Queued ({queue.position(task_id)} ahead)...")
+        else:
+            status.info("⚙️ Running...")
+        time.sleep(POLL_INTERVAL)
+    status.empty()
+
+    if task["status"] == FAILED:
+        st.error(f"❌ Unexpected error: {task['error']['message']}")
+        st.write("**Full traceback:**")
+        st.code(task["error"]["traceback"])
+    elif task["status"] == CANCELLED:
+        st.warning("⏹️ Cancelled")
+
+
+def create_streamlit_app(get_queue):
+    """The UI only submits tasks and renders their events; the pipeline runs in the worker processes."""
     st.title("📧 コールドメールジェネレーター")
 
     # URL Input
@@ -116,165 +251,41 @@ def create_streamlit_app(llm, portfolio, clean_text_fn):
         role = st.text_input("役職 (Role Title)", value="AI/ML Engineer",
                              help="This will be updated automatically when job is extracted")
         use_raw = st.checkbox("Debug: use RAW text (skip clean_text)", value=False)
+        bypass_cache = st.checkbox("Bypass LLM cache (force fresh generation)", value=False)
+        stream_output = st.checkbox("Stream emails as they are generated", value=True)
+        verbose = st.checkbox("Verbose debug output", value=DEBUG_OUTPUT)
 
     # Add option to auto-update role from job posting
     auto_update_role = st.checkbox("✅ Auto-update role title from job posting", value=True)
 
+    debug = st.write if verbose else _quiet
+
     if st.button("送信", type="primary"):
-        try:
-            st.write("=" * 50)
-            st.write("🚀 **DEBUG: Starting processing...**")
-
-            # Step 1: Fetch text
-            st.write("**Step 1: Fetching text**")
-            raw = fetch_text(url_input)
-            st.write(f"📊 Raw text length: {len(raw)}")
-
-            if not raw or len(raw) < 200:
-                st.warning(
-                    "取得できたテキストが非常に少ないため、このページは JavaScript でレンダリングされているか、ボットをブロックしている可能性があります。")
-                st.text_area("Debug preview (raw)", raw[:2000], height=160)
-                return
-
-            # Step 2: Clean text
-            st.write("**Step 2: Processing text**")
-            data = raw if use_raw else clean_text_fn(raw)
-            st.write(f"📊 Processed text length: {len(data)}")
-
-            with st.expander("View processed text (first 1000 chars)"):
-                st.text(data[:1000])
-
-            # Step 3: Load portfolio
-            st.write("**Step 3: Loading portfolio**")
-            try:
-                portfolio.load_portfolio()
-                st.write("✅ Portfolio loaded successfully")
-            except Exception as e:
-                st.error(f"❌ Portfolio loading failed: {str(e)}")
-                st.write(traceback.format_exc())
-                return
-
-            # Step 4: Extract jobs
-            st.write("**Step 4: Extracting jobs**")
-            try:
-                jobs = llm.extract_jobs(data)
-                st.write(f"📊 Jobs extracted: {len(jobs) if jobs else 0}")
-
-                if jobs:
-                    st.write("**Extracted jobs preview:**")
-                    for i, job in enumerate(jobs):
-                        with st.expander(f"Job {i + 1}: {job.get('role', 'Unknown role')}"):
-                            st.json(job)
-                else:
-                    st.write("⚠️ No jobs found")
-            except Exception as e:
-                st.error(f"❌ Job extraction failed: {str(e)}")
-                st.write(traceback.format_exc())
-                return
-
-            if not jobs:
-                st.warning("ページに求人が見つかりませんでした。")
-                st.text_area("Debug preview (processed)", data[:2000], height=200)
-                return
-
-            # Step 5: Generate emails for each job
-            st.write("**Step 5: Generating personalized emails**")
-            for i, job in enumerate(jobs):
-                st.write(f"**Processing job {i + 1}:**")
-
-                # Dynamic role update
-                current_role = role
-                if auto_update_role and job.get('role'):
-                    current_role = job.get('role')
-                    st.info(f"🔄 Auto-updated role to: **{current_role}**")
-
-                # Build a rich JD block for the prompt
-                jd_block = (
-                    f"Role: {job.get('role', 'N/A')}\n"
-                    f"Experience: {job.get('experience', 'N/A')}\n"
-                    f"Skills: {', '.join(job.get('skills', []))}\n"
-                    f"Description: {job.get('description', 'N/A')}"
-                )
+        params = {
+            "url": url_input, "company": company, "recipient": recipient, "role": role, "use_raw": use_raw,
+            "use_cache": not bypass_cache, "stream": stream_output, "auto_update_role": auto_update_role,
+        }
+        # identical requests from several tabs share one run (unless the cache is bypassed)
+        dedupe_key = None if bypass_cache else hashlib.sha1(
+            json.dumps(params, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+        # the task id goes in the URL, so a reload picks the run up again instead of losing it
+        st.query_params["task"] = get_queue().submit("generate", params, dedupe_key=dedupe_key)
 
-                st.write("**Job Description Block:**")
-                st.text(jd_block)
-
-                # Use Techstack matcher
-                st.write("**Querying portfolio for relevant techstack...**")
-                try:
-                    cues = (job.get("skills") or [])[:8]  # use top skills as cues
-                    st.write(f"Skills cues: {cues}")
-
-                    techstack_hits = portfolio.query_techstack(skills=cues, n_results=8)
-                    st.write(f"Techstack hits found: {len(techstack_hits) if techstack_hits else 0}")
-
-                    if techstack_hits:
-                        with st.expander("View matched techstack"):
-                            for hit in techstack_hits:
-                                st.write(f"- {hit}")
-                except Exception as e:
-                    st.error(f"❌ Techstack query failed: {str(e)}")
-                    st.write(traceback.format_exc())
-                    techstack_hits = []
-
-                # Generate email with actual job data
-                st.write("**Generating personalized email...**")
-                try:
-                    email = llm.write_mail(
-                        job_description=jd_block,
-                        company_name=company,
-                        recipient_name=recipient,
-                        role_title=current_role,
-                        techstack_list=techstack_hits or [],
-                        extracted_job_data=job  # Pass the actual job data
-                    )
-
-                    st.write("**Generated Email:**")
-                    st.write(f"Email length: {len(email) if email else 0} characters")
-
-                    if email:
-                        # Create expandable sections for better readability
-                        with st.expander(f"📧 Email for {job.get('role', 'Unknown role')} (Click to expand)",
-                                         expanded=True):
-                            st.markdown("### Generated Email Content")
-                            st.code(email, language="markdown")
-
-                            # Add copy button functionality
-                            st.download_button(
-                                label="💾 Download Email as Text",
-                                data=email,
-                                file_name=f"cold_email_{company}_{current_role.replace('/', '_')}.txt",
-                                mime="text/plain"
-                            )
-                    else:
-                        st.error("❌ Empty email generated!")
-
-                except Exception as e:
-                    st.error(f"❌ Email generation failed: {str(e)}")
-                    st.write(traceback.format_exc())
-
-                st.write("---")  # Separator between jobs
-
-        except Exception as e:
-            st.error(f"❌ Unexpected error: {str(e)}")
-            st.write("**Full traceback:**")
-            st.code(traceback.format_exc())
+    task_id = st.query_params.get("task")
+    if task_id:
+        follow_task(get_queue(), task_id, debug)
 
 
 if __name__ == "__main__":
     try:
-        st.write("🔧 **Initializing components...**")
-
-        st.write("Creating Chain...")
-        chain = Chain()
-        st.write("✅ Chain created")
+        # Worker processes run the pipeline (started once per server process; WORKERS=0: run them elsewhere)
+        start_local_workers()
 
-        st.write("Creating Portfolio...")
-        portfolio = Portfolio()
-        st.write("✅ Portfolio created")
+        create_streamlit_app(get_job_queue)
 
-        create_streamlit_app(chain, portfolio, clean_text)
+        # /metrics endpoint when METRICS_PORT is set (started once per server process)
+        telemetry.start_metrics_server()
 
     except Exception as e:
         st.error(f"❌ Initialization failed: {str(e)}")
-        st.code(traceback.format_exc())
\ No newline at end of file
+        st.code(traceback.format_exc())
@@ -1,48 +1,194 @@
-import uuid
+import csv
+import fcntl
+import hashlib
+import itertools
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 
-import chromadb
-import pandas as pd
-from chromadb.config import Settings
+import telemetry
+from index_backends import default_embedding_function, make_backend
+from skills import PORTFOLIO_CSV, SkillIndex, set_default_skill_index
+
+QUERY_CACHE_SIZE = int(os.getenv("PORTFOLIO_QUERY_CACHE_SIZE", "4096"))
+BATCH_ROWS = int(os.getenv("PORTFOLIO_BATCH_ROWS", "1000"))  # CSV rows read and embedded at a time
+
+
+def row_id(tech):
+    """Stable id for an indexed Techstack string (content hash, identical across runs)."""
+    return hashlib.sha1(tech.encode("utf-8")).hexdigest()
+
+
+def iter_techstacks(path, batch_rows=BATCH_ROWS):
+    """Stream the non-empty Techstack cells of the CSV in lists of up to `batch_rows`."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        cells = (cell for cell in ((row.get("Techstack") or "").strip() for row in csv.DictReader(f)) if cell)
+        while batch := list(itertools.islice(cells, batch_rows)):
+            yield batch
 
 
 class Portfolio:
-    def __init__(self, file_path="app/resource/my_portfolio.csv"):
-        self.data = pd.read_csv(file_path)
+    def __init__(self, file_path=PORTFOLIO_CSV, persist_dir=None, embedding_function=None,
+                 backend=None, batch_rows=None):
+        self.file_path = file_path
+        self.batch_rows = batch_rows or BATCH_ROWS
+        self._synced_mtime = None
+        self._lock = threading.Lock()
+
+        # LRU caches for query strings: skill -> embedding, (skill, n_results) -> matched documents
+        # Index backend: "chroma" (default) or the lightweight in-process "numpy" one (PORTFOLIO_BACKEND)
+        self.backend_name = backend or os.getenv("PORTFOLIO_BACKEND", "chroma")
+        self.embedding_function = embedding_function or default_embedding_function(self.backend_name)
+        self._embeddings = OrderedDict()
+        self._results = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.embed_calls = 0
+        self.embedded_texts = 0
+        self.result_hits = 0
+        self.result_misses = 0
 
-        # FREE deploy: in-memory DB (no filesystem writes) + no telemetry
-        self.chroma_client = chromadb.EphemeralClient(
-            settings=Settings(anonymized_telemetry=False)
+        # Optional on-disk index (PORTFOLIO_INDEX_DIR) so restarts only open the index instead of re-embedding
+        self.persist_dir = persist_dir or os.getenv("PORTFOLIO_INDEX_DIR")
+        self.backend = make_backend(
+            self.backend_name,
+            persist_dir=self.persist_dir,
+            embedder_name=getattr(self.embedding_function, "name", type(self.embedding_function).__name__),
         )
-        self.collection = self.chroma_client.get_or_create_collection(name="portfolio")
 
     def load_portfolio(self):
-        """Index ONLY Techstack strings. No links stored."""
-        if self.collection.count() == 0:
-            docs, ids = [], []
-            for _, row in self.data.iterrows():
-                tech = str(row.get("Techstack", "")).strip()
-                if not tech:
-                    continue
-                docs.append(tech)
-                ids.append(str(uuid.uuid4()))
-            # No metadatas field at all
-            self.collection.add(documents=docs, ids=ids)
+        """
+        Index ONLY Techstack strings. No links stored.
+        Only rows whose content changed since the last sync are embedded (upsert) or removed.
+        The CSV is read and embedded in batches of `batch_rows`, so memory stays flat however
+        long the portfolio is (only the row ids are kept for the whole file).
+        """
+        with self._lock, telemetry.span("portfolio_load", backend=self.backend_name) as record:
+            mtime = os.path.getmtime(self.file_path)
+            if mtime == self._synced_mtime:
+                record["synced"] = False
+                return
+
+            with self._index_lock():
+                self._sync(record)
+            self._synced_mtime = mtime
+
+    @contextmanager
+    def _index_lock(self):
+        """Exclusive across processes (the UI and its workers) for an on-disk index; nothing otherwise."""
+        if not self.persist_dir:
+            yield
+            return
+        os.makedirs(self.persist_dir, exist_ok=True)
+        with open(os.path.join(self.persist_dir, ".sync.lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _sync(self, record):
+        # another process may have synced while we waited for the lock: start from what it saved
+        self.backend.refresh()
+        existing = self.backend.ids()
+        seen = set()
+        embedded = 0
+        skill_index = SkillIndex([])  # rebuilt from the same rows, so skill matches follow the index
+        for batch in iter_techstacks(self.file_path, self.batch_rows):
+            new = {}
+            for tech in batch:
+                skill_index.add(tech)
+                i = row_id(tech)
+                if i not in seen:
+                    seen.add(i)
+                    if i not in existing:
+                        new[i] = tech
+            if new:
+                docs = list(new.values())
+                self.backend.upsert(list(new), docs, self.embedding_function(docs))
+                embedded += len(docs)
+        stale_ids = [i for i in existing if i not in seen]
+
+        if stale_ids:
+            self.backend.delete(stale_ids)
+        record.update(synced=True, embedded=embedded, deleted=len(stale_ids))
+        if embedded or stale_ids:
+            self.backend.save()
+        with self._cache_lock:
+            self._results.clear()  # also when another process already updated the index
+        set_default_skill_index(skill_index)
+
+    def _lru_put(self, cache, key, value):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > QUERY_CACHE_SIZE:
+            cache.popitem(last=False)
+
+    def _embed(self, texts):
+        """Embeddings for query strings; only cache misses are sent to the model (in one call)."""
+        with self._cache_lock:
+            found = {}
+            for t in texts:
+                if t in self._embeddings:
+                    self._embeddings.move_to_end(t)
+                    found[t] = self._embeddings[t]
+        missing = [t for t in dict.fromkeys(texts) if t not in found]
+        if missing:
+            vectors = self.embedding_function(missing)
+            self.embed_calls += 1
+            self.embedded_texts += len(missing)
+            found.update(zip(missing, vectors))
+            with self._cache_lock:
+                for text, vector in zip(missing, vectors):
+                    self._lru_put(self._embeddings, text, vector)
+        return [found[t] for t in texts]
 
     def query_techstack(self, skills, n_results=5):
         """Return top-matching Techstack strings (no links)."""
-        if not skills:
-            return []
-        res = self.collection.query(
-            query_texts=list(skills),
-            n_results=n_results,
-            include=["documents"],
-        )
-        docs_groups = res.get("documents") or []
-        out, seen = [], set()
-        for group in docs_groups:
-            for d in group or []:
-                d = (d or "").strip()
-                if d and d not in seen:
-                    seen.add(d)
-                    out.append(d)
-        return out
\ No newline at end of file
+        return self.query_techstack_batch([skills], n_results=n_results)[0]
+
+    def query_techstack_batch(self, skill_lists, n_results=5):
+        """
+        query_techstack for several jobs at once: the unique skills of all jobs are embedded and
+        queried in a single vectorized call, then the hits are split back out per job.
+        """
+        unique = list(dict.fromkeys(
+            (s or "").strip() for skills in skill_lists for s in (skills or []) if (s or "").strip()
+        ))
+        with telemetry.span("techstack_query", jobs=len(skill_lists), unique_skills=len(unique)) as record:
+            with self._cache_lock:
+                hits = {s: self._results[(s, n_results)] for s in unique if (s, n_results) in self._results}
+            todo = [s for s in unique if s not in hits]
+            self.result_hits += len(hits)
+            self.result_misses += len(todo)
+            record["cached"] = len(hits)
+            if todo:
+                docs_groups = self.backend.query(self._embed(todo), n_results)
+                with self._cache_lock:
+                    for skill, group in zip(todo, docs_groups):
+                        hits[skill] = [d.strip() for d in group or [] if (d or "").strip()]
+                        self._lru_put(self._results, (skill, n_results), hits[skill])
+
+        results = []
+        for skills in skill_lists:
+            out, seen = [], set()
+            for skill in skills or []:
+                for d in hits.get((skill or "").strip(), []):
+                    if d not in seen:
+                        seen.add(d)
+                        out.append(d)
+            results.append(out)
+        return results
+
+    def query_stats(self):
+        """Counters for the query caches (exported as metrics)."""
+        lookups = self.result_hits + self.result_misses
+        return {
+            "embed_calls": self.embed_calls,
+            "embedded_texts": self.embedded_texts,
+            "cached_embeddings": len(self._embeddings),
+            "result_hits": self.result_hits,
+            "result_misses": self.result_misses,
+            "result_hit_rate": (self.result_hits / lookups) if lookups else 0.0,
+            "indexed_rows": self.backend.count(),
+        }
@@ -0,0 +1,87 @@
+"""
+Process-wide shared Chain / Portfolio / Fetcher / JobQueue instances.
+
+Objects held here are built once per process and shared by all its threads: in a worker
+process (worker.py) by every task it runs, in batch.py by every URL. The Streamlit server
+itself only uses the job queue.
+"""
+import importlib
+import threading
+
+import telemetry
+
+# The pipeline's heavy modules: main.py never imports them, worker processes pull them in with
+# warm_up() before they take their first task
+LAZY_MODULES = ("utils", "extractors", "fetcher", "chains", "portfolio")
+
+_lock = threading.Lock()
+_chain = None
+_portfolio = None
+_fetcher = None
+_job_queue = None
+
+
+def get_chain():
+    global _chain
+    if _chain is None:
+        with _lock:
+            if _chain is None:
+                from chains import Chain
+                _chain = Chain()
+                telemetry.register_stats("llm_cache", _chain.cache.stats)
+                telemetry.register_stats("extract_singleflight", _chain.inflight.stats)
+                telemetry.register_stats("llm_scheduler", _chain.scheduler.stats)
+    return _chain
+
+
+def get_portfolio():
+    global _portfolio
+    if _portfolio is None:
+        with _lock:
+            if _portfolio is None:
+                from portfolio import Portfolio
+                _portfolio = Portfolio()
+                telemetry.register_stats("portfolio_query", _portfolio.query_stats)
+    return _portfolio
+
+
+def get_fetcher():
+    """Shared Fetcher so every session reuses one connection pool and the per-host limits."""
+    global _fetcher
+    if _fetcher is None:
+        with _lock:
+            if _fetcher is None:
+                from fetcher import Fetcher
+                _fetcher = Fetcher()
+                telemetry.register_stats("http_cache", _fetcher.cache.stats)
+                telemetry.register_stats("fetch_singleflight", _fetcher.inflight.stats)
+    return _fetcher
+
+
+def get_job_queue():
+    """Shared JobQueue handle (one SQLite connection per process)."""
+    global _job_queue
+    if _job_queue is None:
+        with _lock:
+            if _job_queue is None:
+                from jobqueue import JobQueue
+                _job_queue = JobQueue()
+                telemetry.register_stats("job_queue", _job_queue.stats)
+    return _job_queue
+
+
+def warm_up():
+    """Build the shared objects, sync the index and run one query so the embedding model is loaded."""
+    for name in LAZY_MODULES:
+        importlib.import_module(name)
+    get_fetcher()
+    get_chain()
+    portfolio = get_portfolio()
+    portfolio.load_portfolio()
+    portfolio.query_techstack(["Python"], n_results=1)
+
+
+if __name__ == "__main__":
+    # e.g. `python app/resources.py` at container boot to pre-download the embedding model
+    warm_up()
+    print("✅ Warm-up complete")
@@ -0,0 +1,423 @@
+"""
+Rate-limit-aware scheduling of LLM requests.
+
+Every Chain call goes through one process-wide LLMScheduler, which
+
+  * admits requests against token buckets for requests/min (LLM_RPM) and tokens/min (LLM_TPM),
+    reserving the estimated prompt + completion tokens and settling with the real usage afterwards;
+  * serves priority lanes: queued "interactive" (UI) requests are always admitted before "batch" ones;
+  * retries 429 / 5xx / connection errors with exponential backoff and full jitter, honouring
+    Retry-After; a 429 pauses admission for everybody, not just the caller that hit it.
+
+The buckets live in a SQLite file (LLM_QUOTA_PATH) shared by every process on the host, so the UI
+workers and batch runs together stay within one quota, batch admissions wait while another process
+has interactive requests queued, and a 429 seen by one process pauses all of them.
+
+The lane is taken from the calling context:
+
+    with scheduler.priority(scheduler.BATCH):
+        chain.write_mail(...)
+
+Work submitted to thread pools keeps the lane when run under contextvars.copy_context().
+"""
+import contextvars
+import heapq
+import itertools
+import os
+import pathlib
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import telemetry
+
+LLM_RPM = int(os.getenv("LLM_RPM", "30"))          # 0 = unlimited
+LLM_TPM = int(os.getenv("LLM_TPM", "12000"))       # 0 = unlimited
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60"))
+LLM_COMPLETION_TOKENS = int(os.getenv("LLM_COMPLETION_TOKENS", "800"))  # reserved per request until settled
+LLM_QUOTA_PATH = os.getenv("LLM_QUOTA_PATH", "/tmp/.cache/coldmail/llm_quota.sqlite")  # empty = per process
+SHARED_POLL = 0.1  # other processes do not wake us up: re-check the shared buckets this often
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+_LANE_RANK = {INTERACTIVE: 0, BATCH: 1}
+
+RETRY_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+_lane = contextvars.ContextVar("llm_lane", default=INTERACTIVE)
+
+
+@contextmanager
+def priority(lane):
+    """Run the enclosed LLM calls in `lane` (INTERACTIVE or BATCH)."""
+    if lane not in _LANE_RANK:
+        raise ValueError(f"Unknown priority lane: {lane!r} (expected {INTERACTIVE!r} or {BATCH!r})")
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def current_lane():
+    return _lane.get()
+
+
+class TokenBucket:
+    """Refills at per_minute/60 per second up to `burst` (default: one minute's worth). 0 = unlimited."""
+
+    def __init__(self, per_minute, burst=None):
+        self.per_minute = per_minute
+        self.capacity = float(burst or per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` is available (0 when it is)."""
+        if not self.per_minute:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)  # an oversized request must not wait forever
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        if self.per_minute:
+            self.level -= min(amount, self.capacity)
+
+    def give(self, amount):
+        """Return unused reservation (amount > 0) or charge an overrun (amount < 0)."""
+        if self.per_minute:
+            self.level = min(self.capacity, self.level + amount)
+
+
+class SharedQuota:
+    """
+    The request / token buckets kept in a SQLite file instead of process memory. Capacity and
+    refill rate come from the TokenBuckets passed in (every process reads the same LLM_RPM / LLM_TPM).
+    """
+
+    def __init__(self, path, requests, tokens):
+        self.path = path
+        self.buckets = {"requests": requests, "tokens": tokens}
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _db(self):
+        if self._conn is None:
+            pathlib.Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, level REAL, updated REAL);"
+                "CREATE TABLE IF NOT EXISTS paused (id INTEGER PRIMARY KEY CHECK (id = 0), until REAL);"
+                "CREATE TABLE IF NOT EXISTS interactive_waiting (pid INTEGER PRIMARY KEY, until REAL);"
+            )
+        return self._conn
+
+    def _write(self, fn):
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                out = fn(db)
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+            return out
+
+    def _levels(self, db, now):
+        levels = {}
+        for name, bucket in self.buckets.items():
+            if bucket.per_minute:
+                row = db.execute("SELECT level, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+                level = bucket.capacity if row is None else min(bucket.capacity,
+                                                               row[0] + (now - row[1]) * bucket.rate)
+                levels[name] = level
+        return levels
+
+    @staticmethod
+    def _store(db, levels, now):
+        db.executemany("INSERT OR REPLACE INTO buckets (name, level, updated) VALUES (?, ?, ?)",
+                       [(name, level, now) for name, level in levels.items()])
+
+    def try_take(self, cost, lane):
+        """Take 1 request + `cost` tokens and return 0, or return the seconds to wait before trying again."""
+        def tx(db):
+            now = time.time()
+            levels = self._levels(db, now)
+            amounts = {"requests": 1, "tokens": cost}
+            row = db.execute("SELECT until FROM paused WHERE id = 0").fetchone()
+            wait = max(0.0, (row[0] - now) if row else 0.0)
+            for name, level in levels.items():
+                bucket = self.buckets[name]
+                amount = min(amounts[name], bucket.capacity)
+                if level < amount:
+                    wait = max(wait, (amount - level) / bucket.rate)
+            if lane == BATCH and db.execute("SELECT 1 FROM interactive_waiting WHERE pid != ? AND until > ?",
+                                            (os.getpid(), now)).fetchone():
+                wait = max(wait, SHARED_POLL)  # another process has UI requests queued
+            if wait <= 0:
+                for name in levels:
+                    levels[name] -= min(amounts[name], self.buckets[name].capacity)
+                self._store(db, levels, now)
+                if lane == INTERACTIVE:
+                    db.execute("DELETE FROM interactive_waiting WHERE pid = ?", (os.getpid(),))
+            elif lane == INTERACTIVE:
+                db.execute("INSERT OR REPLACE INTO interactive_waiting (pid, until) VALUES (?, ?)",
+                           (os.getpid(), now + min(wait, 60) + 1.0))
+            return wait
+        return self._write(tx)
+
+    def give(self, tokens):
+        if not self.buckets["tokens"].per_minute or not tokens:
+            return
+
+        def tx(db):
+            now = time.time()
+            levels = self._levels(db, now)
+            levels["tokens"] = min(self.buckets["tokens"].capacity, levels["tokens"] + tokens)
+            self._store(db, levels, now)
+        self._write(tx)
+
+    def pause(self, seconds):
+        until = time.time() + seconds
+        self._write(lambda db: db.execute(
+            "INSERT INTO paused (id, until) VALUES (0, ?) ON CONFLICT(id) DO UPDATE SET until = MAX(until, ?)",
+            (until, until)))
+
+    def available(self):
+        with self._lock:
+            levels = self._levels(self._db(), time.time())
+        return {name: levels.get(name, -1) for name in self.buckets}
+
+
+def status_code(error):
+    code = getattr(error, "status_code", None)
+    if code is None:
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def retry_after(error):
+    """Retry-After header of a provider error, in seconds (None when absent)."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error):
+    code = status_code(error)
+    if code is not None:
+        return code in RETRY_STATUS
+    # groq.APIConnectionError / APITimeoutError, httpx and socket errors
+    return isinstance(error, (ConnectionError, TimeoutError)) or type(error).__name__ in (
+        "APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout", "RemoteProtocolError")
+
+
+class LLMScheduler:
+    def __init__(self, rpm=None, tpm=None, max_retries=None, backoff_base=None, backoff_max=None,
+                 completion_tokens=None, burst_requests=None, burst_tokens=None, quota_path=None):
+        self.requests = TokenBucket(LLM_RPM if rpm is None else rpm, burst_requests)
+        self.tokens = TokenBucket(LLM_TPM if tpm is None else tpm, burst_tokens)
+        quota_path = LLM_QUOTA_PATH if quota_path is None else quota_path
+        limited = self.requests.per_minute or self.tokens.per_minute
+        self.shared = SharedQuota(quota_path, self.requests, self.tokens) if quota_path and limited else None
+        self.max_retries = LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = LLM_BACKOFF_BASE if backoff_base is None else backoff_base
+        self.backoff_max = LLM_BACKOFF_MAX if backoff_max is None else backoff_max
+        self.completion_tokens = LLM_COMPLETION_TOKENS if completion_tokens is None else completion_tokens
+
+        self._cond = threading.Condition()
+        self._queue = []  # heap of [lane rank, seq, cost]; only the head may be admitted
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self.admitted = {INTERACTIVE: 0, BATCH: 0}
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+
+    # --- admission ------------------------------------------------------
+
+    def _acquire(self, cost, lane, seq):
+        ticket = [_LANE_RANK[lane], seq, cost]
+        t0 = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            self._cond.notify_all()  # a higher-priority arrival takes over the head
+            try:
+                while True:
+                    if self._queue[0] is ticket:
+                        wait = self._admit(cost, lane)
+                        if wait <= 0:
+                            heapq.heappop(self._queue)
+                            ticket = None
+                            self.admitted[lane] += 1
+                            self._cond.notify_all()
+                            break
+                        self._cond.wait(min(wait, SHARED_POLL) if self.shared else wait)
+                    else:
+                        self._cond.wait()
+            finally:
+                if ticket is not None:  # interrupted while queued: give up the place in line
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                    self._cond.notify_all()
+        return time.monotonic() - t0
+
+    def _admit(self, cost, lane):
+        """Take the request's quota and return 0, or return how long to wait (called under _cond)."""
+        now = time.monotonic()
+        paused = self._paused_until - now
+        if self.shared:
+            return max(paused, self.shared.try_take(cost, lane))
+        wait = max(paused, self.requests.wait_time(1, now), self.tokens.wait_time(cost, now))
+        if wait <= 0:
+            self.requests.take(1)
+            self.tokens.take(cost)
+        return wait
+
+    def _give(self, tokens):
+        if self.shared:
+            self.shared.give(tokens)
+        else:
+            self.tokens.give(tokens)
+
+    def _settle(self, reserved, used):
+        """Correct the token reservation with the real usage (0 = unknown: keep the reservation)."""
+        if used:
+            with self._cond:
+                self._give(reserved - used)
+                self._cond.notify_all()
+
+    def _backoff(self, error, attempt, reserved):
+        """Delay before the next attempt, or None when `error` must be raised."""
+        with self._cond:
+            self._give(reserved)  # the failed request did not use its tokens
+            if not is_retryable(error) or attempt >= self.max_retries:
+                self.failures += 1
+                return None
+            self.retries += 1
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+            after = retry_after(error)
+            if status_code(error) == 429:
+                self.rate_limited += 1
+                delay = max(delay, after or 0.0)
+                # the provider says we are over quota: hold back every lane, not just this caller
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                if self.shared:
+                    self.shared.pause(delay)  # ... and every other process on this quota
+                self._cond.notify_all()
+            elif after:
+                delay = max(delay, after)
+        telemetry.inc("llm_retries_total", status=status_code(error) or type(error).__name__)
+        return delay
+
+    # --- calls ----------------------------------------------------------
+
+    def run(self, fn, *args, prompt_tokens=0, record=None, **kwargs):
+        """fn(*args, **kwargs) once admitted, retried on transient errors; fn returns an AIMessage."""
+        lane, seq, cost = current_lane(), next(self._seq), prompt_tokens + self.completion_tokens
+        for attempt in itertools.count():
+            waited = self._acquire(cost, lane, seq)
+            self._note(record, lane, waited, attempt)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._backoff(e, attempt, cost)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self._settle(cost, sum(telemetry.token_usage(result)))
+            return result
+
+    def stream(self, fn, *args, prompt_tokens=0, record=None, **kwargs):
+        """
+        Streaming variant of run(): yields the chunks of fn(*args, **kwargs). Errors before the first
+        chunk are retried; once output has been yielded a failure is raised to the caller.
+        """
+        lane, seq, cost = current_lane(), next(self._seq), prompt_tokens + self.completion_tokens
+        for attempt in itertools.count():
+            waited = self._acquire(cost, lane, seq)
+            self._note(record, lane, waited, attempt)
+            chunks = fn(*args, **kwargs)
+            try:
+                first = next(chunks, None)
+            except Exception as e:
+                chunks.close()
+                delay = self._backoff(e, attempt, cost)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            break
+
+        used = 0
+        try:
+            if first is not None:
+                used += sum(telemetry.token_usage(first))
+                yield first
+                for chunk in chunks:
+                    used += sum(telemetry.token_usage(chunk))
+                    yield chunk
+        finally:
+            chunks.close()
+            self._settle(cost, used)
+
+    @staticmethod
+    def _note(record, lane, waited, attempt):
+        telemetry.inc("llm_queue_seconds_total", round(waited, 6), lane=lane)
+        if record is not None:
+            record["lane"] = lane
+            record["queue_s"] = round(record.get("queue_s", 0.0) + waited, 6)
+            record["retries"] = attempt
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            waiting = {lane: sum(1 for t in self._queue if t[0] == rank) for lane, rank in _LANE_RANK.items()}
+            if self.shared:
+                available = self.shared.available()
+            else:
+                self.requests._refill(now)
+                self.tokens._refill(now)
+                available = {"requests": self.requests.level if self.requests.per_minute else -1,
+                             "tokens": self.tokens.level if self.tokens.per_minute else -1}
+            return {
+                "waiting_interactive": waiting[INTERACTIVE],
+                "waiting_batch": waiting[BATCH],
+                "admitted_interactive": self.admitted[INTERACTIVE],
+                "admitted_batch": self.admitted[BATCH],
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "failures": self.failures,
+                "requests_available": available["requests"],
+                "tokens_available": available["tokens"],
+                "paused_s": max(0.0, self._paused_until - now),
+            }
+
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def default_scheduler():
+    """The process-wide scheduler (all Chain instances share the provider quota)."""
+    global _default_scheduler
+    if _default_scheduler is None:
+        with _default_lock:
+            if _default_scheduler is None:
+                _default_scheduler = LLMScheduler()
+    return _default_scheduler
@@ -0,0 +1,60 @@
+import re
+
+import telemetry
+from resources import get_fetcher
+
+
+def _no_log(*args, **kwargs):
+    pass
+
+
+def extract_company_from_url(url):
+    """Extract likely company name from URL"""
+    try:
+        # Extract domain and path patterns
+        if "greenhouse.io" in url:
+            # Pattern: job-boards.greenhouse.io/COMPANY/jobs/
+            match = re.search(r'greenhouse\.io/([^/]+)', url)
+            if match:
+                company = match.group(1).replace('-', ' ').title()
+                return company
+        elif "lever.co" in url:
+            # Pattern: jobs.lever.co/COMPANY/
+            match = re.search(r'lever\.co/([^/]+)', url)
+            if match:
+                company = match.group(1).replace('-', ' ').title()
+                return company
+        else:
+            # Try to extract from general URL patterns
+            match = re.search(r'://(?:www\.)?([^./]+)', url)
+            if match:
+                company = match.group(1).replace('-', ' ').title()
+                return company
+    except:
+        pass
+    return "Company, Inc."
+
+
+def fetch_page(url: str, log=None):
+    """Download the page once through the shared pooled fetcher; returns a fetcher.Page."""
+    log = log or _no_log
+    log(f"🔍 Fetching: {url}")
+    with telemetry.span("fetch", url=url) as record:
+        page = get_fetcher().fetch(url)
+        record.update(bytes=len(page.html), chars=len(page.text), from_cache=page.from_cache,
+                      truncated=page.truncated)
+    log(f"✅ Fetched {len(page.html)} bytes ({page.content_type or 'unknown type'}"
+        f"{', not modified since last fetch' if page.from_cache else ''}) -> {len(page.text)} characters")
+    if page.truncated:
+        log("⚠️ Page is larger than HTTP_MAX_BYTES: only the beginning was read")
+    return page
+
+
+def fetch_text(url: str, log=None) -> str:
+    """Fetch the page and return its visible text ("" on failure)."""
+    log = log or _no_log
+    try:
+        return fetch_page(url, log=log).text
+    except Exception as e:
+        log(f"❌ Fetch failed: {str(e)}")
+        return ""
@@ -0,0 +1,87 @@
+"""
+Request coalescing: concurrent calls with the same key share one in-flight execution.
+
+    flight = SingleFlight("fetch")
+    page = flight.do(url, download, url)
+
+The first caller for a key (the leader) runs the function; callers arriving while it runs wait
+for it and receive the same result, or have the same exception raised. Nothing is cached: once
+the call finishes the key is released and the next call runs again.
+
+If the leader is interrupted by a BaseException (KeyboardInterrupt, a Streamlit script stop, ...)
+rather than failing, the waiters are not handed that interruption: one of them becomes the new
+leader and retries. A waiter that is itself interrupted simply leaves; it holds no state.
+"""
+import threading
+
+import telemetry
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "abandoned", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.abandoned = False
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, name, share=None):
+        """`share(result)` is applied once per extra consumer (e.g. copy.deepcopy for mutable results)."""
+        self.name = name
+        self.share = share
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.joined = 0
+        self.retries = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """fn(*args, **kwargs), unless an identical call is already running: then wait for its result."""
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is None:
+                    call = self._calls[key] = _Call()
+                    self.leaders += 1
+                    leader = True
+                else:
+                    call.waiters += 1
+                    self.joined += 1
+                    leader = False
+            telemetry.inc("singleflight_calls_total", group=self.name, role="leader" if leader else "joined")
+            if leader:
+                return self._lead(key, call, fn, args, kwargs)
+
+            call.done.wait()
+            if call.abandoned:
+                with self._lock:
+                    self.retries += 1
+                continue  # the leader was interrupted, not failed: try again (possibly as leader)
+            if call.error is not None:
+                raise call.error
+            return self.share(call.result) if self.share else call.result
+
+    def _lead(self, key, call, fn, args, kwargs):
+        try:
+            call.result = fn(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        except BaseException:
+            call.abandoned = True
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]  # no new waiters from here on, so call.waiters is final
+            call.done.set()
+        # the waiters read call.result, so the leader must not hand out the same mutable object
+        return self.share(call.result) if self.share and call.waiters else call.result
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._calls)
+        return {"leaders": self.leaders, "joined": self.joined, "retries": self.retries, "in_flight": in_flight}
@@ -0,0 +1,216 @@
+"""
+Precomputed skill index over the portfolio Techstack column.
+
+Skills and techstack names are normalized (lowercase tokens + alias table), then looked up
+through a phrase table and a token -> techstack inverted index, so the cost of a lookup
+depends on the skill, not on the number of portfolio rows.
+"""
+import csv
+import os
+import re
+import threading
+
+PORTFOLIO_CSV = os.getenv("PORTFOLIO_CSV", "app/resource/my_portfolio.csv")
+
+# Normalized phrase -> canonical phrase
+ALIASES = {
+    "js": "javascript",
+    "ecmascript": "javascript",
+    "ts": "typescript",
+    "k8s": "kubernetes",
+    "py": "python",
+    "python3": "python",
+    "golang": "go",
+    "postgres": "postgresql",
+    "psql": "postgresql",
+    "mongo": "mongodb",
+    "reactjs": "react",
+    "react.js": "react",
+    "vuejs": "vue",
+    "vue.js": "vue",
+    "nextjs": "next.js",
+    "node": "node.js",
+    "nodejs": "node.js",
+    "amazon web services": "aws",
+    "gcp": "google cloud",
+    "google cloud platform": "google cloud",
+    "ml": "machine learning",
+    "dl": "deep learning",
+    "ai": "artificial intelligence",
+    "llm": "large language models",
+    "llms": "large language models",
+    "nlp": "natural language processing",
+    "tf": "tensorflow",
+    "sklearn": "scikit-learn",
+    "scikit learn": "scikit-learn",
+    "ci cd": "ci/cd",
+    "cicd": "ci/cd",
+    "rest": "rest api",
+    "restful": "rest api",
+    "restful api": "rest api",
+    "tailwindcss": "tailwind css",
+    "tailwind": "tailwind css",
+    "aws ec2": "amazon ec2",
+    "aws s3": "amazon s3",
+}
+
+# Tech names that are also everyday words or letters ("render charts", "Series C funding", "railway
+# track"). In free text they only count on their own when capitalized inside a sentence; single
+# letters never do
+AMBIGUOUS = frozenset({
+    "bootstrap", "c", "d", "express", "git", "go", "jest", "node", "postman", "r", "railway", "react",
+    "render", "rest", "selenium", "spring", "stripe", "swift",
+})
+
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:[./][a-z0-9+#]+)*")
+_ANY_CASE_TOKEN = re.compile(_TOKEN.pattern, re.IGNORECASE)
+_SENTENCE_ENDS = ".!?…。！？"
+_CANONICAL = frozenset(ALIASES.values())
+_MAX_ALIAS_LEN = max(len(phrase.split()) for phrase in (*ALIASES, *_CANONICAL))
+
+
+def _resolve(tokens):
+    """Resolve aliases once, longest run of tokens first; canonical phrases are kept as they are."""
+    out, i = [], 0
+    while i < len(tokens):
+        for n in range(min(_MAX_ALIAS_LEN, len(tokens) - i), 0, -1):
+            run = " ".join(tokens[i:i + n])
+            if run in _CANONICAL or run in ALIASES:
+                # "rest api" stays "rest api" (not "rest api api"); "restful api" becomes "rest api"
+                out.append(ALIASES.get(run, run))
+                i += n
+                break
+        else:
+            out.append(tokens[i])
+            i += 1
+    return " ".join(out)
+
+
+def normalize(text):
+    """Lowercase, tokenize and resolve aliases; normalize(normalize(x)) == normalize(x)."""
+    return _resolve(_TOKEN.findall(str(text).lower()))
+
+
+class SkillIndex:
+    def __init__(self, techstack):
+        self.techstack = []
+        self._phrases = {}   # canonical phrase -> techstack index
+        self._postings = {}  # canonical token -> set of techstack indexes
+        self._tokens = []    # techstack index -> set of canonical tokens
+        self.max_phrase_len = 1
+        for tech in techstack:
+            self.add(tech)
+
+    @classmethod
+    def from_csv(cls, file_path=PORTFOLIO_CSV):
+        # utf-8-sig, like Portfolio: an Excel BOM must not hide the Techstack column
+        with open(file_path, newline="", encoding="utf-8-sig") as f:
+            return cls((row.get("Techstack") or "").strip() for row in csv.DictReader(f))
+
+    def add(self, tech):
+        phrase = normalize(tech)
+        if not phrase or phrase in self._phrases:
+            return
+        i = len(self.techstack)
+        self.techstack.append(tech)
+        self._phrases[phrase] = i
+        tokens = set(phrase.split())
+        self._tokens.append(tokens)
+        self.max_phrase_len = max(self.max_phrase_len, len(phrase.split()))
+        for token in tokens:
+            self._postings.setdefault(token, set()).add(i)
+
+    def __len__(self):
+        return len(self.techstack)
+
+    def match(self, skill, limit=3, min_score=0.3):
+        """Ranked [(techstack, score)] for one skill: 1.0 exact/alias match, else token overlap (Jaccard)."""
+        phrase = normalize(skill)
+        if not phrase:
+            return []
+        exact = self._phrases.get(phrase)
+        scores = {exact: 1.0} if exact is not None else {}
+
+        tokens = set(phrase.split())
+        candidates = set()
+        for token in tokens:
+            candidates |= self._postings.get(token, set())
+        for i in candidates:
+            if i == exact:
+                continue
+            overlap = len(tokens & self._tokens[i])
+            score = 0.9 * overlap / len(tokens | self._tokens[i])
+            if score >= min_score:
+                scores[i] = score
+
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1], self.techstack[kv[0]]))
+        return [(self.techstack[i], round(score, 3)) for i, score in ranked[:limit]]
+
+    def match_all(self, skills, limit=3, min_score=0.3):
+        """{skill: ranked matches} for every skill that matched something."""
+        out = {}
+        for skill in skills:
+            matches = self.match(skill, limit=limit, min_score=min_score)
+            if matches:
+                out[skill] = matches
+        return out
+
+    def find_in_text(self, text):
+        """
+        Techstack names mentioned in free text (longest phrase wins), in order of first mention.
+        AMBIGUOUS names only count when written like a name: capitalized, not opening a sentence.
+        """
+        text = str(text)
+        matches = list(_ANY_CASE_TOKEN.finditer(text))
+        tokens = [m.group().lower() for m in matches]
+        window = max(self.max_phrase_len, _MAX_ALIAS_LEN)
+        found, seen = [], set()
+        i = 0
+        while i < len(tokens):
+            for n in range(min(window, len(tokens) - i), 0, -1):
+                hit = self._phrases.get(normalize(" ".join(tokens[i:i + n])))
+                if hit is not None and (n > 1 or self._named(text, matches[i])):
+                    if hit not in seen:
+                        seen.add(hit)
+                        found.append(self.techstack[hit])
+                    i += n
+                    break
+            else:
+                i += 1
+        return found
+
+    @staticmethod
+    def _named(text, match):
+        word = match.group()
+        if word.lower() not in AMBIGUOUS:
+            return True
+        if len(word) == 1 or not word[0].isupper():
+            return False
+        before = text[max(0, match.start() - 8):match.start()].rstrip()
+        return bool(before) and before[-1] not in _SENTENCE_ENDS
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def default_skill_index():
+    """
+    The SkillIndex of the portfolio: replaced by Portfolio.load_portfolio() on every sync, and
+    built from PORTFOLIO_CSV if it is needed before the portfolio has been loaded.
+    """
+    global _default_index
+    if _default_index is None:
+        with _default_lock:
+            if _default_index is None:
+                try:
+                    _default_index = SkillIndex.from_csv()
+                except OSError:
+                    _default_index = SkillIndex([])
+    return _default_index
+
+
+def set_default_skill_index(index):
+    global _default_index
+    with _default_lock:
+        _default_index = index
@@ -0,0 +1,223 @@
+"""
+Pipeline instrumentation: per-stage spans, LLM token usage and cache statistics.
+
+    with telemetry.trace("ui_run", url=url) as spans:      # groups the spans of one pipeline run
+        with telemetry.span("fetch", url=url):
+            ...
+        telemetry.record_llm_usage("extract_jobs", ai_message)
+
+Finished spans are appended to a JSONL trace file (TRACE_FILE, empty = off) and aggregated into
+Prometheus-style metrics, served on METRICS_PORT (unset = no endpoint) or via render_metrics().
+Work submitted to thread pools should run under contextvars.copy_context() to stay in the trace.
+"""
+import contextvars
+import json
+import os
+import pathlib
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TRACE_FILE = os.getenv("TRACE_FILE", "/tmp/.cache/coldmail/traces.jsonl")
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(50 * 1024 * 1024)))  # rotate past this size
+TRACE_BACKUPS = int(os.getenv("TRACE_BACKUPS", "3"))  # traces.jsonl.1 ... .N are kept
+METRICS_PORT = os.getenv("METRICS_PORT")
+
+BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_trace_id = contextvars.ContextVar("trace_id", default=None)
+_trace_spans = contextvars.ContextVar("trace_spans", default=None)
+
+_lock = threading.Lock()        # metrics
+_trace_lock = threading.Lock()  # trace file (never held together with _lock)
+_trace_dir_ready = False
+_durations = {}   # (stage, status) -> [count, sum, bucket counts]
+_counters = {}    # (name, labels tuple) -> value
+_stats_sources = {}
+_server = None
+
+
+def _observe(stage, status, seconds):
+    with _lock:
+        entry = _durations.setdefault((stage, status), [0, 0.0, [0] * len(BUCKETS)])
+        entry[0] += 1
+        entry[1] += seconds
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                entry[2][i] += 1
+
+
+def inc(name, value=1, **labels):
+    """Increment a counter, e.g. inc("llm_tokens_total", 120, call="write_mail", kind="prompt")."""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def register_stats(prefix, fn):
+    """Export the numeric values of fn() -> dict as gauges `coldmail_<prefix>_<key>` (read at scrape time)."""
+    _stats_sources[prefix] = fn
+
+
+def _rotate_trace():
+    """traces.jsonl -> .1 -> .2 ...; the oldest backup is dropped."""
+    for i in range(TRACE_BACKUPS - 1, 0, -1):
+        if os.path.exists(f"{TRACE_FILE}.{i}"):
+            os.replace(f"{TRACE_FILE}.{i}", f"{TRACE_FILE}.{i + 1}")
+    if TRACE_BACKUPS:
+        os.replace(TRACE_FILE, f"{TRACE_FILE}.1")
+    else:
+        os.remove(TRACE_FILE)
+
+
+def _write_trace(record):
+    global _trace_dir_ready
+    if not TRACE_FILE:
+        return
+    line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+    try:
+        with _trace_lock:
+            if not _trace_dir_ready:
+                pathlib.Path(TRACE_FILE).parent.mkdir(parents=True, exist_ok=True)
+                _trace_dir_ready = True
+            # opened per span (append mode), so a rotation by another process is picked up at once
+            with open(TRACE_FILE, "a", encoding="utf-8") as f:
+                f.write(line)
+                size = f.tell()
+            if TRACE_MAX_BYTES and size > TRACE_MAX_BYTES:
+                _rotate_trace()
+    except OSError:
+        pass  # tracing must never break the pipeline
+
+
+def new_trace_id():
+    return uuid.uuid4().hex[:16]
+
+
+@contextmanager
+def trace(name, trace_id=None, **attrs):
+    """
+    Start a trace (one pipeline run); yields the list its spans are collected into.
+    Pass `trace_id` to continue a trace whose stages run at different times (batch records).
+    """
+    spans = []
+    id_token = _trace_id.set(trace_id or new_trace_id())
+    spans_token = _trace_spans.set(spans)
+    try:
+        with span(name, **attrs):
+            yield spans
+    finally:
+        _trace_spans.reset(spans_token)
+        _trace_id.reset(id_token)
+
+
+@contextmanager
+def span(stage, **attrs):
+    """Time a pipeline stage; yields a dict that callers may add attributes to."""
+    record = {"trace_id": _trace_id.get(), "stage": stage, "start": time.time(), **attrs}
+    t0 = time.perf_counter()
+    status = "ok"
+    try:
+        yield record
+    except GeneratorExit:
+        status = "cancelled"  # consumer stopped a streaming generator early
+        raise
+    except BaseException as e:
+        status = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record["duration_s"] = round(time.perf_counter() - t0, 6)
+        record["status"] = status
+        _observe(stage, status, record["duration_s"])
+        spans = _trace_spans.get()
+        if spans is not None:
+            spans.append(record)
+        _write_trace(record)
+
+
+def token_usage(message):
+    """(prompt_tokens, completion_tokens) from a LangChain AIMessage / merged AIMessageChunk."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    meta = getattr(message, "response_metadata", None) or {}
+    usage = meta.get("token_usage") or meta.get("usage") or {}
+    return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+
+
+def record_llm_usage(call, message, record=None):
+    prompt, completion = token_usage(message)
+    inc("llm_tokens_total", prompt, call=call, kind="prompt")
+    inc("llm_tokens_total", completion, call=call, kind="completion")
+    if record is not None:
+        record.update(prompt_tokens=prompt, completion_tokens=completion)
+    return prompt, completion
+
+
+def render_metrics():
+    """Prometheus text exposition of all metrics."""
+    lines = [
+        "# HELP coldmail_stage_duration_seconds Pipeline stage duration.",
+        "# TYPE coldmail_stage_duration_seconds histogram",
+    ]
+    with _lock:
+        durations = {k: (v[0], v[1], list(v[2])) for k, v in _durations.items()}
+        counters = dict(_counters)
+    for (stage, status), (count, total, buckets) in sorted(durations.items()):
+        labels = f'stage="{stage}",status="{status}"'
+        for bound, n in zip(BUCKETS, buckets):
+            lines.append(f'coldmail_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {n}')
+        lines.append(f'coldmail_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+        lines.append(f"coldmail_stage_duration_seconds_sum{{{labels}}} {total:.6f}")
+        lines.append(f"coldmail_stage_duration_seconds_count{{{labels}}} {count}")
+
+    seen = set()
+    for (name, labels), value in sorted(counters.items()):
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# TYPE coldmail_{name} counter")
+        label_str = ",".join(f'{k}="{v}"' for k, v in labels)
+        lines.append(f"coldmail_{name}{{{label_str}}} {value}")
+
+    for prefix, fn in sorted(_stats_sources.items()):
+        try:
+            stats = fn()
+        except Exception:
+            continue
+        for key, value in sorted(stats.items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f"# TYPE coldmail_{prefix}_{key} gauge")
+                lines.append(f"coldmail_{prefix}_{key} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_metrics_server(port=None):
+    """Serve /metrics on `port` (default METRICS_PORT) once per process; no-op when unset."""
+    global _server
+    port = port or METRICS_PORT
+    if not port:
+        return None
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer(("0.0.0.0", int(port)), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+    return _server
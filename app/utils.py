@@ -1,9 +1,107 @@
 import re
 
+from lxml import etree
+
+# Elements whose text is never part of a job posting
+SKIP_TAGS = frozenset({
+    "script", "style", "noscript", "template", "svg", "iframe", "head", "nav", "footer", "aside", "button",
+})
+# Inline elements do not break a text run: "Py<b>thon</b>" is one word, as with BeautifulSoup's get_text()
+INLINE_TAGS = frozenset({
+    "a", "abbr", "b", "bdi", "bdo", "cite", "code", "data", "dfn", "em", "font", "i", "kbd", "mark", "q", "s",
+    "samp", "small", "span", "strong", "sub", "sup", "time", "u", "var",
+})
+SKIP_ROLES = frozenset({"navigation", "contentinfo", "banner", "search", "dialog"})
+
+_LOOKS_LIKE_HTML = re.compile(r"<(?:[a-zA-Z][\w-]*[\s/>]|!|/[a-zA-Z])")
+
+
+class _TextTarget:
+    """lxml parser target: collects visible text in one pass, skipping boilerplate subtrees."""
+
+    def __init__(self):
+        self.parts = []
+        self.pending = []
+        self.skip_depth = 0
+
+    def _flush(self):
+        # libxml2 may deliver one text node in several data() calls; join before splitting
+        # (pending only ever holds visible text: data() ignores skipped subtrees)
+        if self.pending:
+            self.parts.extend("".join(self.pending).split())
+            self.pending.clear()
+
+    def start(self, tag, attrib):
+        if tag not in INLINE_TAGS:
+            self._flush()
+        if self.skip_depth:
+            self.skip_depth += 1
+        elif tag in SKIP_TAGS or attrib.get("role") in SKIP_ROLES or "hidden" in attrib:
+            self.skip_depth = 1
+
+    def end(self, tag):
+        if tag not in INLINE_TAGS:
+            self._flush()
+        if self.skip_depth:
+            self.skip_depth -= 1
+
+    def data(self, data):
+        if not self.skip_depth:
+            self.pending.append(data)
+
+    def close(self):
+        self._flush()
+        return " ".join(self.parts)
+
+
+class HtmlTextExtractor:
+    """
+    Incremental HTML -> text: feed() bytes/str chunks as they arrive, close() returns the
+    whitespace-normalized visible text. Single pass, no intermediate tree.
+    """
+
+    def __init__(self, encoding=None):
+        self._parser = etree.HTMLParser(target=_TextTarget(), recover=True, no_network=True,
+                                        encoding=encoding)
+        self._encoding = encoding
+        self._tail = None
+        self._fed = False
+
+    def feed(self, chunk):
+        if not chunk:
+            return
+        if isinstance(chunk, bytes) and not self._fed and not self._encoding:
+            self._parser = etree.HTMLParser(target=_TextTarget(), recover=True, no_network=True,
+                                            encoding="utf-8")
+        self._fed = True
+        if self._tail:
+            chunk = self._tail + chunk
+        # libxml2's push parser mis-handles an end tag split across feeds (e.g. "</st" + "yle>"),
+        # so only hand it data up to the last complete tag and keep the rest for the next feed
+        cut = chunk.rfind(b">" if isinstance(chunk, bytes) else ">") + 1
+        self._tail = chunk[cut:]
+        if cut:
+            self._parser.feed(chunk[:cut])
+
+    def close(self):
+        if not self._fed:
+            return ""
+        if self._tail:
+            self._parser.feed(self._tail)
+        return self._parser.close()
+
+
+def html_to_text(html, encoding=None):
+    """Visible, whitespace-normalized text of an HTML document (script/style/nav/footer... dropped)."""
+    extractor = HtmlTextExtractor(encoding=encoding)
+    extractor.feed(html)
+    return extractor.close()
+
 
 def clean_text(text):
-    # Remove HTML tags
-    text = re.sub(r'<[^>]*?>', '', text)
+    # Remove HTML tags (single lxml pass; drops script/style/nav/footer boilerplate)
+    if _LOOKS_LIKE_HTML.search(text):
+        return html_to_text(text)
     # Remove URLs
     # text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', text)
     # # Remove special characters
@@ -14,4 +112,106 @@ def clean_text(text):
     # text = text.strip()
     # Remove extra whitespace
     text = ' '.join(text.split())
-    return text
\ No newline at end of file
+    return text
+
+
+def estimate_tokens(text):
+    """Cheap token estimate: ~4 chars per token for ASCII, ~1 token per CJK/other character."""
+    if not text:
+        return 0
+    non_ascii = len(text) - len(text.encode("ascii", "ignore"))
+    return (len(text) - non_ascii) // 4 + non_ascii + 1
+
+
+def truncate_tokens(text, max_tokens, ellipsis="..."):
+    """
+    Cut text to ~max_tokens (same estimate as estimate_tokens), preferably at a sentence end,
+    otherwise at whitespace. Text that already fits is returned unchanged.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    budget = max(0, max_tokens - 1) * 4  # in quarter tokens: ASCII char = 1, other = 4
+    if text.isascii():
+        end = budget
+    else:
+        used = end = 0
+        for end, ch in enumerate(text):
+            used += 1 if ord(ch) <= 127 else 4
+            if used > budget:
+                break
+    window = text[:end]
+    floor = len(window) // 2
+    sentence_ends = [m.start() for m in _SENTENCE_END.finditer(window) if m.start() > floor]
+    if sentence_ends:
+        return window[:sentence_ends[-1]].rstrip() + " " + ellipsis
+    space = window.rfind(" ", floor)
+    return (window[:space] if space > 0 else window).rstrip() + ellipsis
+
+
+# Phrases that usually start a new posting on a careers page (text is already whitespace-normalized).
+# Labels must be capitalized (or upper-case) and followed by a colon, so prose such as "the role you
+# will..." or "location is..." is not mistaken for the start of a posting.
+_LABELS = ("Job Title", "Position", "Role", "Job ID", "Req ID", "Requisition ID", "Location")
+_JOB_BOUNDARY = re.compile(
+    r"(?=\b(?:" + "|".join(_LABELS + tuple(label.upper() for label in _LABELS)) + r")\s*[:：])"
+    r"|(?=\b(?:Apply now|Apply for this job|APPLY NOW)\b)"
+    r"|(?=募集職種|職種[:：]|ポジション[:：])"
+)
+_SENTENCE_END = re.compile(r"(?<=[.!?。！？])\s*")
+
+
+def split_job_chunks(text, max_tokens=6000, overlap_chars=300):
+    """
+    Split cleaned page text into chunks of at most ~max_tokens, cutting preferably at job boundaries,
+    then sentence ends, then whitespace. Neighbouring chunks overlap slightly so a posting cut in two
+    is still seen whole by one of them (duplicates are merged afterwards).
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+
+    chunks, start = [], 0
+    while start < len(text):
+        # grow the window until it hits the budget
+        end = min(start + max_tokens * 4, len(text))
+        tokens = estimate_tokens(text[start:end])
+        while tokens > max_tokens:
+            end = start + max(1, int((end - start) * max_tokens / tokens * 0.95))
+            tokens = estimate_tokens(text[start:end])
+        if end >= len(text):
+            chunks.append(text[start:])
+            break
+
+        window = text[start:end]
+        floor = len(window) // 2  # never produce chunks smaller than half the budget
+        cut = None
+        for pattern in (_JOB_BOUNDARY, _SENTENCE_END):
+            positions = [m.start() for m in pattern.finditer(window) if m.start() > floor]
+            if positions:
+                cut = positions[-1]
+                break
+        if cut is None:
+            cut = window.rfind(" ", floor)
+            cut = cut if cut > 0 else len(window)
+
+        chunks.append(window[:cut].strip())
+        start = max(start + cut - overlap_chars, start + 1)
+        # resume on a word boundary
+        space = text.find(" ", start)
+        start = space + 1 if 0 <= space < start + overlap_chars else start
+    return [c for c in chunks if c]
+
+
+def fit_sections(sections, max_tokens):
+    """
+    Token-budget several prompt sections at once. `sections` is [(name, text, floor_tokens)] in
+    priority order: each section is first granted up to its floor, then the rest of the budget goes
+    to the sections in order. Returns {name: text}, truncated with truncate_tokens where needed.
+    """
+    sizes = {name: estimate_tokens(text) for name, text, _ in sections}
+    grant = {name: min(sizes[name], floor) for name, _, floor in sections}
+    left = max_tokens - sum(grant.values())
+    for name, _, _ in sections:
+        extra = max(0, min(sizes[name] - grant[name], left))
+        grant[name] += extra
+        left -= extra
+    return {name: truncate_tokens(text, grant[name]) for name, text, _ in sections}
@@ -0,0 +1,318 @@
+"""
+Worker processes for the job queue (jobqueue.py).
+
+    python app/worker.py --workers 4
+
+starts a supervisor with 4 worker processes. Each worker loads Chain / Portfolio once, then claims
+queued tasks on WORKER_THREADS threads and runs the pipeline (fetch -> extract -> techstack query ->
+emails), appending its progress to the task's event log for the UI to render. Tasks on the threads
+of one worker share its Fetcher and Chain, so the same page fetched or extracted by several tasks at
+once is downloaded and sent to the LLM once. Crashed workers are restarted; their tasks are picked
+up again when the lease runs out.
+
+The Streamlit app starts a local pool itself (WORKERS, default 1) unless WORKERS=0, e.g. when the
+workers run in a separate container against the same JOB_QUEUE_PATH.
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+import telemetry
+from jobqueue import JobQueue, TaskError
+
+WORKERS = int(os.getenv("WORKERS", "1"))
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "4"))  # tasks run at once by one worker process
+POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "0.5"))
+PARTIAL_INTERVAL = 0.25  # seconds between streamed partial-email events per job
+
+_local_pool = None
+_local_lock = threading.Lock()
+
+
+class Stopped(Exception):
+    """The task was cancelled (or taken over by another worker) while running."""
+
+
+def _error(e):
+    if e is None:
+        return None
+    return {"message": str(e), "traceback": "".join(traceback.format_exception(e))}
+
+
+def result_to_event(result):
+    """generation.JobResult -> JSON-able dict (exceptions become message + traceback text)."""
+    return {
+        "index": result.index, "job": result.job, "role": result.role, "jd_block": result.jd_block,
+        "techstack": result.techstack, "email": result.email,
+        "techstack_error": _error(result.techstack_error), "error": _error(result.error),
+    }
+
+
+def result_from_event(data):
+    """Inverse of result_to_event, for rendering in the UI."""
+    from generation import JobResult
+
+    def error(value):
+        return TaskError(value["message"], value["traceback"]) if value else None
+
+    return JobResult(index=data["index"], job=data["job"], role=data["role"], jd_block=data["jd_block"],
+                     techstack=data["techstack"], email=data["email"],
+                     techstack_error=error(data["techstack_error"]), error=error(data["error"]))
+
+
+def run_generate(params, emit, should_stop, drop_partials=lambda index: None):
+    """
+    The cold email pipeline for one URL. Progress goes to emit(type, data):
+    log / warning / error / text / jobs / partial / result. drop_partials(index) is called once
+    a job's result is out. Returns a small summary dict.
+    """
+    from contextlib import closing
+
+    import scraper
+    from extractors import extract_structured
+    from generation import GenerationEngine, JobChunk
+    from resources import get_chain, get_portfolio
+    from utils import clean_text
+
+    def log(text, debug=True):
+        emit("log", {"text": text, "debug": debug})
+
+    def checkpoint():
+        if should_stop():
+            raise Stopped()
+
+    url, use_cache = params["url"], params.get("use_cache", True)
+    log("=" * 50)
+    log("🚀 **DEBUG: Starting processing...**")
+    llm, portfolio = get_chain(), get_portfolio()
+
+    # Step 1: Fetch text
+    log("**Step 1: Fetching text**")
+    try:
+        page = scraper.fetch_page(url, log=log)
+    except Exception as e:
+        log(f"❌ Fetch failed: {str(e)}")
+        page = None
+    raw = page.text if page else ""
+    log(f"📊 Raw text length: {len(raw)}")
+
+    # ATS pages usually embed JSON-LD / __NEXT_DATA__; parsing it beats an LLM round-trip
+    structured_jobs, extractor_name = extract_structured(url, page.html) if page else (None, None)
+
+    if not structured_jobs and (not raw or len(raw) < 200):
+        emit("warning", {
+            "text": "取得できたテキストが非常に少ないため、このページは JavaScript でレンダリングされているか、ボットをブロックしている可能性があります。",
+            "label": "Debug preview (raw)", "preview": raw[:2000]})
+        return {"jobs": 0}
+    checkpoint()
+
+    # Step 2: Clean text
+    log("**Step 2: Processing text**")
+    with telemetry.span("clean", chars=len(raw), raw=params.get("use_raw", False)):
+        data = raw if params.get("use_raw") else clean_text(raw)
+    log(f"📊 Processed text length: {len(data)}")
+    emit("text", {"preview": data[:1000]})
+
+    # Step 3: Load portfolio
+    log("**Step 3: Loading portfolio**")
+    try:
+        portfolio.load_portfolio()
+        log("✅ Portfolio loaded successfully")
+    except Exception as e:
+        emit("error", {"text": f"❌ Portfolio loading failed: {str(e)}", "traceback": traceback.format_exc()})
+        return {"jobs": 0}
+    checkpoint()
+
+    # Step 4: Extract jobs
+    log("**Step 4: Extracting jobs**")
+    try:
+        if structured_jobs:
+            jobs = structured_jobs
+            log(f"⚡ Structured job data found ({extractor_name}) — skipped LLM extraction")
+        else:
+            jobs = llm.extract_jobs(data, use_cache=use_cache)
+        log(f"📊 Jobs extracted: {len(jobs) if jobs else 0}")
+        if not jobs:
+            log("⚠️ No jobs found")
+    except Exception as e:
+        emit("error", {"text": f"❌ Job extraction failed: {str(e)}", "traceback": traceback.format_exc()})
+        return {"jobs": 0}
+
+    if not jobs:
+        emit("warning", {"text": "ページに求人が見つかりませんでした。", "label": "Debug preview (processed)",
+                         "preview": data[:2000]})
+        return {"jobs": 0}
+    checkpoint()
+
+    # Step 5: Generate emails for each job (concurrently; the UI renders them in page order)
+    emit("jobs", {"jobs": jobs})
+    log("**Step 5: Generating personalized emails**")
+    engine = GenerationEngine(llm, portfolio, use_cache=use_cache)
+    unsent, last_sent, emails = {}, {}, 0
+    with closing(engine.generate(jobs, params["company"], params["recipient"], params["role"],
+                                 auto_update_role=params.get("auto_update_role", True),
+                                 stream=params.get("stream", True))) as events:
+        for event in events:
+            checkpoint()  # raising here closes the generator, which cancels the remaining jobs
+            if isinstance(event, JobChunk):
+                # partial events carry only the text since the previous one; the UI appends them
+                unsent[event.index] = unsent.get(event.index, "") + event.text
+                now = time.monotonic()
+                if now - last_sent.get(event.index, 0.0) >= PARTIAL_INTERVAL:
+                    last_sent[event.index] = now
+                    emit("partial", {"index": event.index, "role": event.role, "text": unsent.pop(event.index)})
+                continue
+            emails += bool(event.email)
+            emit("result", result_to_event(event))
+            drop_partials(event.index)  # superseded by the result: keep the event log small
+
+    stats = llm.cache.stats()
+    log(f"🗄️ LLM cache: {stats['hits']} hits / {stats['misses']} misses "
+        f"({stats['hit_rate']:.0%} hit rate, {stats['entries']} entries)")
+    return {"jobs": len(jobs), "emails": emails}
+
+
+TASK_HANDLERS = {"generate": run_generate}
+
+
+def run_task(queue, task, worker):
+    """Run one claimed task, renewing its lease in the background until it ends."""
+    task_id, attempt = task["id"], task["attempts"]
+    stopped = threading.Event()
+    done = threading.Event()
+
+    def heartbeat():
+        while not done.wait(queue.lease / 3):
+            if not queue.heartbeat(task_id, worker):
+                stopped.set()
+                return
+
+    beat = threading.Thread(target=heartbeat, name=f"heartbeat-{task_id}", daemon=True)
+    beat.start()
+    try:
+        with telemetry.trace("task", kind=task["kind"], task_id=task_id) as spans:
+            result = TASK_HANDLERS[task["kind"]](
+                task["params"], lambda kind, data: queue.emit(task_id, attempt, kind, data), stopped.is_set,
+                lambda index: queue.drop_partials(task_id, index))
+        queue.emit(task_id, attempt, "spans", spans)
+        queue.finish(task_id, worker, result)
+    except Stopped:
+        pass  # cancelled from the UI: the task row already says so
+    except Exception as e:
+        queue.fail(task_id, worker, f"{type(e).__name__}: {e}", traceback.format_exc())
+    finally:
+        done.set()
+
+
+def _claim_loop(queue, worker, poll_interval):
+    while True:
+        task = queue.claim(worker)
+        if task is None:
+            time.sleep(poll_interval)
+            continue
+        run_task(queue, task, worker)
+
+
+def worker_loop(worker, poll_interval=POLL_INTERVAL, metrics_port=None, threads=WORKER_THREADS):
+    """Claim and run tasks forever (one process, `threads` tasks at a time)."""
+    from resources import get_job_queue, warm_up
+
+    telemetry.start_metrics_server(metrics_port)
+    queue = get_job_queue()
+    warm_up()  # load the models before taking work, so the first task is not the slow one
+    loops = [threading.Thread(target=_claim_loop, name=f"tasks-{n}", daemon=True,
+                              args=(queue, f"{worker}-{n}", poll_interval))
+             for n in range(max(1, threads))]
+    for loop in loops:
+        loop.start()
+    while all(loop.is_alive() for loop in loops):
+        time.sleep(1.0)
+    sys.exit(1)  # a claim loop died (e.g. the queue file went away): let the supervisor restart us
+
+
+def _sync_index():
+    from resources import get_portfolio
+
+    get_portfolio().load_portfolio()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def serve(workers, parent_pid=None, threads=WORKER_THREADS):
+    """Supervise `workers` worker processes; restart the ones that die. Returns on SIGTERM/SIGINT."""
+    import multiprocessing
+
+    ctx = multiprocessing.get_context("spawn")  # no forked copies of the supervisor's threads/locks
+    metrics_base = int(telemetry.METRICS_PORT) if telemetry.METRICS_PORT else None
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    if os.getenv("PORTFOLIO_INDEX_DIR"):
+        # build the shared on-disk index once, so the workers' warm_up() only opens it
+        sync = ctx.Process(target=_sync_index, name="index-sync")
+        sync.start()
+        sync.join()
+
+    queue = JobQueue()
+    procs, last_purge = {}, 0.0
+    name = f"{os.uname().nodename}-{os.getpid()}"
+    while not stop.is_set():
+        for i in range(workers):
+            if i not in procs or not procs[i].is_alive():
+                procs[i] = ctx.Process(target=worker_loop, name=f"worker-{i}", daemon=True,
+                                       args=(f"{name}-{i}", POLL_INTERVAL,
+                                             metrics_base + 1 + i if metrics_base else None, threads))
+                procs[i].start()
+        if parent_pid and not _alive(parent_pid):
+            break  # the Streamlit server that started us is gone
+        if time.monotonic() - last_purge > 600:
+            queue.purge()
+            last_purge = time.monotonic()
+        stop.wait(1.0)
+
+    for proc in procs.values():
+        proc.terminate()
+    for proc in procs.values():
+        proc.join(5)
+
+
+def start_local_workers(workers=None):
+    """Start a worker pool for this server process once (restarted if it died); no-op with WORKERS=0."""
+    global _local_pool
+    workers = WORKERS if workers is None else workers
+    if not workers:
+        return None
+    with _local_lock:
+        if _local_pool is None or _local_pool.poll() is not None:
+            _local_pool = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--workers", str(workers),
+                 "--parent-pid", str(os.getpid())],
+            )
+    return _local_pool
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run cold email worker processes for the job queue.")
+    parser.add_argument("--workers", type=int, default=WORKERS or 1)
+    parser.add_argument("--threads", type=int, default=WORKER_THREADS, help="tasks run at once per worker")
+    parser.add_argument("--parent-pid", type=int, default=None, help="exit when this process exits")
+    args = parser.parse_args(argv)
+    serve(args.workers, parent_pid=args.parent_pid, threads=args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Microbenchmark: HTML -> text throughput of the old path vs utils.html_to_text.
+
+Old path (before the lxml extractor):
+    BeautifulSoup(html, "html.parser").get_text(" ", strip=True)  -> regex tag strip -> " ".join(split())
+
+    python benchmarks/bench_clean_text.py                     # synthetic 1 / 5 / 20 MB careers pages
+    python benchmarks/bench_clean_text.py saved_page.html ... # your own saved pages
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from utils import html_to_text  # noqa: E402
+
+SKILLS = ["Python", "AWS", "Docker", "Kubernetes", "React", "TypeScript", "PyTorch", "SQL", "Go", "LLM"]
+
+
+def legacy_clean(html):
+    text = BeautifulSoup(html, "html.parser").get_text(" ", strip=True)
+    text = re.sub(r'<[^>]*?>', '', text)
+    return ' '.join(text.split())
+
+
+def synthetic_careers_page(target_bytes, seed=0):
+    """A careers page with nav/footer boilerplate, inline scripts/styles and many job cards."""
+    rng = random.Random(seed)
+    head = (
+        "<!DOCTYPE html><html><head><title>Careers</title>"
+        "<style>" + ".c{margin:0;padding:4px}" * 200 + "</style>"
+        "<script>window.__STATE__ = " + '{"k": "' + "x" * 20000 + '"};</script></head><body>'
+        "<nav>" + "".join(f"<a href='/p{i}'>Menu {i}</a>" for i in range(50)) + "</nav><main>"
+    )
+    tail = "</main><footer>" + "<p>© Company, all rights reserved.</p>" * 20 + "</footer></body></html>"
+    cards, size, i = [], len(head) + len(tail), 0
+    while size < target_bytes:
+        skills = rng.sample(SKILLS, 4)
+        card = (
+            f"<div class='job-card'><h2>Senior Engineer {i}</h2>"
+            f"<p class='loc'>Location: Tokyo &amp; Remote</p>"
+            f"<ul>{''.join(f'<li>{s}</li>' for s in skills)}</ul>"
+            f"<p>We are looking for an engineer with {rng.randint(2, 8)} years of experience in "
+            f"{', '.join(skills)}. You will design, build and operate production systems.</p>"
+            f"<script>track({i});</script><a class='apply' href='/apply/{i}'>Apply now</a></div>\n"
+        )
+        cards.append(card)
+        size += len(card)
+        i += 1
+    return head + "".join(cards) + tail
+
+
+def bench(fn, html, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(html)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="saved HTML pages (default: synthetic pages)")
+    parser.add_argument("--sizes", default="1,5,20", help="synthetic page sizes in MB")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.files:
+        inputs = [(os.path.basename(p), open(p, encoding="utf-8", errors="replace").read()) for p in args.files]
+    else:
+        inputs = [(f"synthetic-{mb}MB", synthetic_careers_page(int(float(mb) * 1024 * 1024)))
+                  for mb in args.sizes.split(",")]
+
+    print(f"{'input':<20} {'MB':>7} {'legacy MB/s':>12} {'lxml MB/s':>10} {'speedup':>8}")
+    for name, html in inputs:
+        mb = len(html.encode("utf-8")) / (1024 * 1024)
+        old = bench(legacy_clean, html, args.repeat)
+        new = bench(html_to_text, html, args.repeat)
+        print(f"{name:<20} {mb:7.2f} {mb / old:12.1f} {mb / new:10.1f} {old / new:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
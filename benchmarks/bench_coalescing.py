@@ -0,0 +1,91 @@
+"""
+Duplicate upstream work under concurrent sessions on the same URLs.
+
+Simulates --sessions users pasting the same fixture URLs at the same moment: each session runs
+fetch_text + Chain.extract_jobs for every page. Counts the HTTP requests the local fixture server
+receives and the calls the stand-in LLM gets, and compares them with what a single session needs.
+With request coalescing there should be no duplicates.
+
+    python benchmarks/bench_coalescing.py --sessions 16 --llm-latency 0.3
+"""
+import argparse
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+import bench_pipeline  # sets up the offline environment before any app module is imported
+from fake_llm import RecordedChatModel
+
+
+class CountingModel(RecordedChatModel):
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        with _lock:
+            counts["llm"] += 1
+        return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+
+class CountingHandler(bench_pipeline._QuietHandler):
+    def do_GET(self):
+        with _lock:
+            counts["http"] += 1
+        time.sleep(self.server.delay)  # a slow job board, so the sessions' requests overlap
+        super().do_GET()
+
+
+_lock = threading.Lock()
+counts = {"http": 0, "llm": 0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="fake LLM time to first token (s)")
+    parser.add_argument("--fetch-latency", type=float, default=0.2, help="fixture server response delay (s)")
+    args = parser.parse_args(argv)
+
+    from chains import EXTRACT_CHUNK_TOKENS, Chain
+    from fetcher import page_text
+    from resources import get_fetcher
+    from scraper import fetch_text
+    from utils import split_job_chunks
+
+    pages = sorted(name for name in os.listdir(bench_pipeline.PAGES) if name.endswith(".html"))
+    llm_calls_needed = 0
+    for name in pages:
+        with open(os.path.join(bench_pipeline.PAGES, name), encoding="utf-8") as f:
+            text = page_text(f.read(), "text/html")
+        llm_calls_needed += len(split_job_chunks(text, max_tokens=EXTRACT_CHUNK_TOKENS))
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0),
+                                 functools.partial(CountingHandler, directory=bench_pipeline.PAGES))
+    server.delay = args.fetch_latency
+    threading.Thread(target=server.serve_forever, name="fixtures", daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    chain = Chain(llm=CountingModel.from_fixtures(latency_s=args.llm_latency))
+
+    def session(_):
+        for name in pages:
+            chain.extract_jobs(fetch_text(f"{base_url}/{name}"), use_cache=False)
+
+    t0 = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+            list(pool.map(session, range(args.sessions)))
+    finally:
+        server.shutdown()
+    elapsed = time.perf_counter() - t0
+
+    print(f"{args.sessions} sessions x {len(pages)} pages in {elapsed:.2f} s")
+    print(f"HTTP requests: {counts['http']:>4} (one session needs {len(pages)}, "
+          f"duplicates: {counts['http'] - len(pages)})")
+    print(f"LLM calls:     {counts['llm']:>4} (one session needs {llm_calls_needed}, "
+          f"duplicates: {counts['llm'] - llm_calls_needed})")
+    print(f"fetch coalescing:   {get_fetcher().inflight.stats()}")
+    print(f"extract coalescing: {chain.inflight.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Import-time profile of the Streamlit entry point (`python -X importtime`).
+
+Importing app/main.py is what every container boot / Streamlit reload pays before the first pixel.
+The report lists the slowest top-level packages; the regression check fails (exit 1) when
+
+  * a module from HEAVY_MODULES is imported at startup (they must stay lazy), or
+  * total startup import time exceeds --budget-ms.
+
+    python benchmarks/bench_importtime.py
+    python benchmarks/bench_importtime.py --module chains --top 20   # profile any app module
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app")
+
+# Loaded on first use / by the background warm-up, never while rendering the UI shell
+HEAVY_MODULES = ("langchain_core", "langchain_groq", "langchain_community", "chromadb", "onnxruntime",
+                 "pandas", "bs4", "lxml", "requests", "numpy", "chains", "portfolio", "fetcher", "extractors")
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def profile(module):
+    """Return [(module, self_us, cumulative_us, depth)] for `import module`."""
+    env = dict(os.environ, PYTHONPATH=APP, PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          env=env, capture_output=True, text=True, cwd=ROOT)
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr[-2000:])
+        raise SystemExit(f"importing {module} failed")
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)), (len(m.group(3)) - 1) // 2))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main", help="module to import (default: the Streamlit app)")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "0")),
+                        help="fail if total import time exceeds this (0 = no time budget)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs; the fastest total is reported")
+    args = parser.parse_args(argv)
+
+    runs = [profile(args.module) for _ in range(max(1, args.repeat))]
+    rows = min(runs, key=lambda r: sum(self_us for _, self_us, _, _ in r))
+    total_ms = sum(self_us for _, self_us, _, _ in rows) / 1000
+    # direct imports of the profiled module (depth 1) plus any other top-level imports
+    top_level = sorted((r for r in rows if r[3] == 1 or (r[3] == 0 and r[0] != args.module)),
+                       key=lambda r: -r[2])
+
+    print(f"import {args.module}: {total_ms:.1f} ms total, {len(rows)} modules")
+    print(f"{'cumulative ms':>14}  module")
+    for name, _, cumulative, _ in top_level[:args.top]:
+        print(f"{cumulative / 1000:14.1f}  {name}")
+
+    failures = []
+    if args.module == "main":
+        loaded = {name.split(".")[0] for name, _, _, _ in rows}
+        eager = sorted(loaded & set(HEAVY_MODULES))
+        if eager:
+            failures.append(f"heavy modules imported at startup: {', '.join(eager)}")
+    if args.budget_ms and total_ms > args.budget_ms:
+        failures.append(f"startup import time {total_ms:.1f} ms exceeds budget {args.budget_ms:.1f} ms")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ startup import check passed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Peak memory of page and portfolio ingestion as the input grows, each case in a fresh interpreter.
+
+  pages      a generated careers page of --page-mb sizes, served from localhost
+               buffered   requests' r.text, then html_to_text over the whole string (the old path)
+               streaming  Fetcher.fetch: streamed body, byte cap (HTTP_MAX_BYTES), incremental parsing
+  portfolio  a generated my_portfolio.csv of --rows sizes, indexed with the numpy backend
+               pandas     read_csv + iterrows, all rows embedded in one call (the old path)
+               batched    Portfolio.load_portfolio: csv streamed and embedded PORTFOLIO_BATCH_ROWS at a time
+
+"peak MB" is ru_maxrss minus the RSS after imports. For the portfolio the index itself (vectors and
+documents) has to stay in memory; "index MB" shows its share.
+
+    python benchmarks/bench_memory.py
+    python benchmarks/bench_memory.py --page-mb 1 16 64 --rows 1000 50000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench_portfolio_backends import make_csv
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app")
+
+BLOCK = ("<div class='job'><h2>シニアエンジニア Senior Backend Engineer</h2><p>Python, Go, AWS, Kubernetes. "
+         "データ基盤の設計と運用をリードしていただきます。</p><ul><li>Remote</li><li>Full-time</li></ul>"
+         "<script>window.dataLayer.push({'event': 'view'})</script></div>\n").encode("utf-8")
+
+CHILD = r"""
+import json, resource, sys
+case, arg = sys.argv[1], sys.argv[2]
+
+def rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+if case in ("buffered", "streaming"):
+    import requests
+    from fetcher import Fetcher
+    from utils import html_to_text
+    base = rss()
+    if case == "buffered":
+        r = requests.get(arg, timeout=60)
+        text = html_to_text(r.text)
+        size = len(r.content)
+    else:
+        page = Fetcher().fetch(arg, timeout=60)
+        text, size = page.text, len(page.html.encode("utf-8"))
+    out = {"read_mb": size / 1e6, "chars": len(text)}
+else:
+    import pandas as pd
+    from portfolio import Portfolio, row_id
+    base = rss()
+    p = Portfolio(arg, backend="numpy")
+    if case == "pandas":
+        data = pd.read_csv(arg)
+        wanted = {}
+        for _, row in data.iterrows():
+            tech = str(row.get("Techstack", "")).strip()
+            if tech:
+                wanted[row_id(tech)] = tech
+        docs = list(wanted.values())
+        p.backend.upsert(list(wanted), docs, p.embedding_function(docs))
+    else:
+        p.load_portfolio()
+    b = p.backend
+    out = {"rows": b.count(),
+           "index_mb": (b.nbytes() + sum(sys.getsizeof(d) for d in b._docs)) / 1e6}
+out["peak_mb"] = rss() - base
+print(json.dumps(out))
+"""
+
+
+class _PageHandler(BaseHTTPRequestHandler):
+    """GET /<megabytes> streams a page of that size, generated block by block."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        blocks = int(float(self.path.strip("/")) * 1e6) // len(BLOCK)
+        head, tail = b"<html><head><title>Careers</title></head><body>", b"</body></html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(head) + blocks * len(BLOCK) + len(tail)))
+        self.end_headers()
+        try:
+            self.wfile.write(head)
+            for start in range(0, blocks, 256):
+                self.wfile.write(BLOCK * min(256, blocks - start))
+            self.wfile.write(tail)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the streaming fetcher stops reading at its byte cap
+
+
+def run(case, arg):
+    env = dict(os.environ, PYTHONPATH=APP, PORTFOLIO_EMBEDDER="hashing", ANONYMIZED_TELEMETRY="false",
+               TRACE_FILE="", HTTP_CACHE_DISABLED="1", HTTP_HOST_MIN_INTERVAL="0")
+    env.pop("PORTFOLIO_INDEX_DIR", None)
+    out = subprocess.run([sys.executable, "-c", CHILD, case, arg], env=env, capture_output=True, text=True,
+                         check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-mb", type=float, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args(argv)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _PageHandler)
+    threading.Thread(target=server.serve_forever, name="pages", daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"{'page':>8} {'mode':<10} {'read MB':>8} {'text chars':>11} {'peak MB':>8}")
+    try:
+        for mb in args.page_mb:
+            for case in ("buffered", "streaming"):
+                r = run(case, f"{base_url}/{mb}")
+                print(f"{mb:>6g}MB {case:<10} {r['read_mb']:>8.1f} {r['chars']:>11} {r['peak_mb']:>8.1f}")
+    finally:
+        server.shutdown()
+
+    print(f"\n{'rows':>8} {'mode':<10} {'indexed':>8} {'index MB':>9} {'peak MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            path = os.path.join(tmp, f"portfolio_{rows}.csv")
+            make_csv(rows, path)
+            for case in ("pandas", "batched"):
+                r = run(case, path)
+                print(f"{rows:>8} {case:<10} {r['rows']:>8} {r['index_mb']:>9.1f} {r['peak_mb']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Offline end-to-end benchmark of the pipeline stages.
+
+Serves the saved careers pages in benchmarks/fixtures/pages from a local http.server and runs
+every page through fetch_text -> clean_text -> Chain.extract_jobs -> Portfolio.query_techstack ->
+Chain.write_mail, with RecordedChatModel (fake_llm.py) standing in for Groq. No network access,
+API key or model download is needed.
+
+Reports p50/p95/p99 latency and throughput per stage, pages/s end to end and peak RSS. With
+--json the results (plus commit, Python version and settings) are written as JSON; --compare
+prints the change against an earlier results file:
+
+    python benchmarks/bench_pipeline.py --json bench_output.json
+    git stash && python benchmarks/bench_pipeline.py --json base.json && git stash pop
+    python benchmarks/bench_pipeline.py --compare base.json
+
+LLM latency is 0 by default so the numbers measure the pipeline's own overhead; pass
+--llm-latency / --llm-tps to simulate a real model.
+"""
+import argparse
+import functools
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app")
+PAGES = os.path.join(ROOT, "benchmarks", "fixtures", "pages")
+sys.path.insert(0, APP)
+
+# Offline and uncached: every iteration pays the full cost of every stage
+os.environ.update({
+    "LLM_CACHE_DISABLED": "1",
+    "HTTP_CACHE_DISABLED": "1",
+    "HTTP_HOST_MIN_INTERVAL": "0",
+    "PORTFOLIO_BACKEND": os.getenv("PORTFOLIO_BACKEND", "numpy"),
+    "PORTFOLIO_EMBEDDER": os.getenv("PORTFOLIO_EMBEDDER", "hashing"),
+    "TRACE_FILE": "",
+    "LLM_RPM": "0",  # the stand-in model has no quota to respect
+    "LLM_TPM": "0",
+    "ANONYMIZED_TELEMETRY": "false",
+})
+os.environ.pop("PORTFOLIO_INDEX_DIR", None)
+
+from fake_llm import RecordedChatModel  # noqa: E402
+
+STAGES = ("fetch_text", "clean_text", "extract_jobs", "query_techstack", "write_mail")
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve_fixtures():
+    """Serve PAGES on a free localhost port; returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_QuietHandler, directory=PAGES))
+    threading.Thread(target=server.serve_forever, name="fixtures", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(q / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(iterations, llm_latency, llm_tps):
+    from chains import Chain
+    from portfolio import Portfolio
+    from scraper import fetch_text
+    from utils import clean_text
+
+    chain = Chain(llm=RecordedChatModel.from_fixtures(latency_s=llm_latency, tokens_per_s=llm_tps))
+    portfolio = Portfolio(os.path.join(APP, "resource", "my_portfolio.csv"))
+    portfolio.load_portfolio()
+
+    server, base_url = serve_fixtures()
+    pages = sorted(name for name in os.listdir(PAGES) if name.endswith(".html"))
+    timings = {stage: [] for stage in STAGES}
+    bytes_cleaned = 0
+
+    def timed(stage, fn, *args, **kwargs):
+        t0 = time.perf_counter()
+        out = fn(*args, **kwargs)
+        timings[stage].append(time.perf_counter() - t0)
+        return out
+
+    wall0 = time.perf_counter()
+    try:
+        for _ in range(iterations):
+            for name in pages:
+                timed("fetch_text", fetch_text, f"{base_url}/{name}")
+                with open(os.path.join(PAGES, name), encoding="utf-8") as f:
+                    html = f.read()
+                bytes_cleaned += len(html.encode("utf-8"))
+                text = timed("clean_text", clean_text, html)
+                jobs = timed("extract_jobs", chain.extract_jobs, text, use_cache=False)
+                for job in jobs:
+                    # cold lookups: drop the query caches so every call embeds and searches
+                    portfolio._results.clear()
+                    portfolio._embeddings.clear()
+                    techstack = timed("query_techstack", portfolio.query_techstack, (job.get("skills") or [])[:8],
+                                      n_results=8)
+                    timed("write_mail", chain.write_mail, job.get("description", ""), "Acme", "採用担当者様",
+                          job.get("role", ""), techstack, extracted_job_data=job, use_cache=False)
+    finally:
+        server.shutdown()
+    wall = time.perf_counter() - wall0
+
+    stages = {}
+    for stage, values in timings.items():
+        values.sort()
+        total = sum(values)
+        stages[stage] = {
+            "n": len(values),
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "mean_ms": statistics.fmean(values) * 1000 if values else 0.0,
+            "ops_per_s": len(values) / total if total else 0.0,
+        }
+    clean_total = sum(timings["clean_text"])
+    stages["clean_text"]["mb_per_s"] = bytes_cleaned / 1e6 / clean_total if clean_total else 0.0
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "iterations": iterations,
+            "pages": len(pages),
+            "llm_latency_s": llm_latency,
+            "llm_tokens_per_s": llm_tps,
+            "portfolio_backend": os.environ["PORTFOLIO_BACKEND"],
+        },
+        "stages": stages,
+        "pipeline": {"pages": iterations * len(pages), "wall_s": wall,
+                     "pages_per_s": iterations * len(pages) / wall if wall else 0.0},
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def report(results, baseline=None):
+    def delta(stage, key):
+        if not baseline or stage not in baseline.get("stages", {}):
+            return ""
+        before = baseline["stages"][stage][key]
+        return f" ({(results['stages'][stage][key] - before) / before:+.0%})" if before else ""
+
+    print(f"{'stage':<16} {'n':>5} {'p50 ms':>16} {'p95 ms':>16} {'p99 ms':>16} {'ops/s':>10}")
+    for stage, s in results["stages"].items():
+        print(f"{stage:<16} {s['n']:>5} {s['p50_ms']:>9.3f}{delta(stage, 'p50_ms'):>7} "
+              f"{s['p95_ms']:>9.3f}{delta(stage, 'p95_ms'):>7} {s['p99_ms']:>9.3f}{delta(stage, 'p99_ms'):>7} "
+              f"{s['ops_per_s']:>10.1f}")
+    p = results["pipeline"]
+    print(f"pipeline: {p['pages']} pages in {p['wall_s']:.2f} s ({p['pages_per_s']:.1f} pages/s), "
+          f"clean_text {results['stages']['clean_text']['mb_per_s']:.1f} MB/s, "
+          f"peak RSS {results['peak_rss_mb']:.1f} MB")
+    if baseline:
+        print(f"compared with {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5, help="passes over the fixture pages")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="fake LLM time to first token (s)")
+    parser.add_argument("--llm-tps", type=float, default=0.0, help="fake LLM output tokens/s (0 = instant)")
+    parser.add_argument("--json", help="write machine-readable results to this file")
+    parser.add_argument("--compare", help="earlier --json results to compare against")
+    args = parser.parse_args(argv)
+
+    results = run(args.iterations, args.llm_latency, args.llm_tps)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
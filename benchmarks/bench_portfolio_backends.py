@@ -0,0 +1,91 @@
+"""
+Cold-start cost of the Portfolio index backends: import time, index build, query latency and
+peak RSS, each measured in a fresh interpreter.
+
+    python benchmarks/bench_portfolio_backends.py
+    python benchmarks/bench_portfolio_backends.py --rows 5000 --cases numpy:hashing,chroma:hashing
+
+Each case is backend:embedder. The defaults are numpy:hashing and chroma:onnx, so comparing just
+those two mostly measures the embedder swap (and the hashing embedder matches lexically, not
+semantically). numpy:onnx and chroma:hashing separate the cost of the index from the cost of the
+embedder. The onnx cases need the MiniLM model (downloaded on first use) and are reported as
+unavailable when it cannot be loaded.
+"""
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app")
+
+CHILD = r"""
+import json, resource, sys, time
+t0 = time.perf_counter()
+from portfolio import Portfolio
+t1 = time.perf_counter()
+p = Portfolio(sys.argv[1], backend=sys.argv[2])
+p.load_portfolio()
+t2 = time.perf_counter()
+skills = ["Python", "AWS", "Docker", "React", "TypeScript", "PostgreSQL", "Kubernetes", "LangChain"]
+p.query_techstack_batch([skills], n_results=8)  # warm
+t3 = time.perf_counter()
+for i in range(50):
+    p.query_techstack_batch([[s + str(i) for s in skills]], n_results=8)
+t4 = time.perf_counter()
+print(json.dumps({
+    "import_s": t1 - t0,
+    "build_s": t2 - t1,
+    "query_ms": (t4 - t3) / 50 * 1000,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+
+def make_csv(rows, path):
+    base = [row["Techstack"] for row in csv.DictReader(open(os.path.join(APP, "resource", "my_portfolio.csv")))]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Techstack", "Links"])
+        for i in range(rows):
+            tech = base[i % len(base)] if i < len(base) else f"{base[i % len(base)]} {i}"
+            writer.writerow([tech, f"https://example.com/{i}"])
+
+
+def run(backend, embedder, csv_path):
+    env = dict(os.environ, PYTHONPATH=APP, PORTFOLIO_EMBEDDER=embedder, ANONYMIZED_TELEMETRY="false")
+    env.pop("PORTFOLIO_INDEX_DIR", None)
+    out = subprocess.run([sys.executable, "-c", CHILD, csv_path, backend], env=env,
+                         capture_output=True, text=True)
+    if out.returncode != 0:
+        return None
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="86,1000,5000", help="portfolio sizes (comma separated)")
+    parser.add_argument("--cases", default="numpy:hashing,numpy:onnx,chroma:hashing,chroma:onnx",
+                        help="backend:embedder pairs (comma separated)")
+    args = parser.parse_args(argv)
+
+    print(f"{'case':<15} {'rows':>6} {'import s':>9} {'build s':>8} {'query ms':>9} {'peak RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in (int(r) for r in args.rows.split(",")):
+            csv_path = os.path.join(tmp, f"portfolio_{rows}.csv")
+            make_csv(rows, csv_path)
+            for case in args.cases.split(","):
+                backend, _, embedder = case.partition(":")
+                r = run(backend, embedder or "hashing", csv_path)
+                if r is None:
+                    print(f"{case:<15} {rows:>6}  unavailable (embedder could not be loaded)")
+                    continue
+                print(f"{case:<15} {rows:>6} {r['import_s']:9.3f} {r['build_s']:8.3f} "
+                      f"{r['query_ms']:9.2f} {r['peak_rss_mb']:12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Email prompt size and assembly cost.
+
+Reports the static (prefix-cacheable) and per-job token counts of the email prompt and the time
+Chain._prepare_mail + rendering takes per email, for short and long job descriptions.
+Token counts use utils.estimate_tokens, the same estimate the prompt budget is enforced with.
+
+    python benchmarks/bench_prompts.py
+    MAIL_INPUT_TOKENS=400 python benchmarks/bench_prompts.py
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+os.environ.setdefault("GROQ_API_KEY", "bench")  # ChatGroq is constructed but never called
+os.environ.setdefault("LLM_CACHE_DISABLED", "1")
+
+from chains import MAIL_INPUT_TOKENS, Chain  # noqa: E402
+from utils import estimate_tokens  # noqa: E402
+
+SKILLS = ["Python", "PyTorch", "AWS", "Docker", "Kubernetes", "LangChain", "PostgreSQL", "React", "TypeScript",
+          "FastAPI", "MLOps", "Terraform"]
+SENTENCE = "You will design, ship and operate LLM-powered features together with product and data teams. "
+
+
+def sample_jobs():
+    return {
+        "short": {"role": "ML Engineer", "experience": "3+ years", "skills": SKILLS[:4],
+                  "description": SENTENCE * 2},
+        "typical": {"role": "Senior ML Engineer", "experience": "5+ years", "skills": SKILLS[:8],
+                    "description": SENTENCE * 12},
+        "long": {"role": "Staff AI Engineer", "experience": "8+ years", "skills": SKILLS,
+                 "description": SENTENCE * 80},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    chain = Chain()
+    print(f"MAIL_INPUT_TOKENS={MAIL_INPUT_TOKENS}")
+    print(f"{'job':<8} {'static tok':>10} {'per-job tok':>11} {'total tok':>9} {'assemble p50 ms':>16} "
+          f"{'p99 ms':>7}")
+    for name, job in sample_jobs().items():
+        call = ("", "Acme", "採用担当者様", "AI/ML Engineer", ["Python, AWS"], job)
+        timings = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            prompt, inputs = chain._prepare_mail(*call)
+            messages = prompt.format_prompt(**inputs)
+            messages.to_string()  # cache key
+            timings.append((time.perf_counter() - t0) * 1000)
+        system, human = messages.to_messages()
+        timings.sort()
+        print(f"{name:<8} {estimate_tokens(system.content):>10} {estimate_tokens(human.content):>11} "
+              f"{estimate_tokens(system.content + human.content):>9} {statistics.median(timings):>16.3f} "
+              f"{timings[int(len(timings) * 0.99) - 1]:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Throughput against a rate-limited provider, with and without the LLM scheduler.
+
+A stand-in provider enforces a requests-per-minute quota and answers 429 (with Retry-After) when
+it is exceeded. --workers threads (half interactive, half batch) call it for --seconds:
+
+  direct     no admission control and no retries, like calling ChatGroq straight away
+  scheduler  through scheduler.LLMScheduler configured with the same quota
+
+    python benchmarks/bench_scheduler.py --rpm 600 --workers 16 --seconds 6
+"""
+import argparse
+import threading
+import time
+import types
+
+import bench_pipeline  # noqa: F401  (offline environment, app on sys.path)
+from scheduler import BATCH, INTERACTIVE, LLMScheduler, priority
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__("429 Too Many Requests")
+        self.status_code = 429
+        self.response = types.SimpleNamespace(headers={"retry-after": f"{retry_after:.3f}"})
+
+
+class QuotaProvider:
+    """Token bucket quota like the provider's: `rpm` per minute, `burst` requests at once."""
+
+    def __init__(self, rpm, burst, latency):
+        self.rate, self.burst, self.latency = rpm / 60.0, burst, latency
+        self.level, self.updated = float(burst), time.monotonic()
+        self.lock = threading.Lock()
+        self.accepted = self.rejected = 0
+
+    def call(self):
+        with self.lock:
+            now = time.monotonic()
+            self.level = min(self.burst, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.level < 1:
+                self.rejected += 1
+                raise RateLimited((1 - self.level) / self.rate)
+            self.level -= 1
+            self.accepted += 1
+        time.sleep(self.latency)
+        return "ok"
+
+
+def run(mode, rpm, burst, workers, seconds, latency):
+    provider = QuotaProvider(rpm, burst, latency)
+    sched = LLMScheduler(rpm=rpm, tpm=0, burst_requests=burst, backoff_base=0.2, max_retries=8,
+                         completion_tokens=0, quota_path="")  # this process only: no shared quota file
+    done = {INTERACTIVE: [], BATCH: []}
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def worker(lane):
+        with priority(lane):
+            while time.monotonic() < deadline:
+                t0 = time.monotonic()
+                try:
+                    if mode == "direct":
+                        provider.call()
+                    else:
+                        sched.run(provider.call)
+                except RateLimited:
+                    with lock:
+                        errors[0] += 1
+                    continue
+                with lock:
+                    done[lane].append(time.monotonic() - t0)
+
+    threads = [threading.Thread(target=worker, args=(INTERACTIVE if i % 2 == 0 else BATCH,))
+               for i in range(workers)]
+    t0 = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - t0
+
+    def p95(values):
+        values = sorted(values)
+        return values[int(len(values) * 0.95) - 1] * 1000 if values else 0.0
+
+    total = len(done[INTERACTIVE]) + len(done[BATCH])
+    print(f"{mode:<10} {total / elapsed:>8.1f} {rpm / 60:>8.1f} {errors[0]:>7} {provider.rejected:>9} "
+          f"{len(done[INTERACTIVE]):>6} {p95(done[INTERACTIVE]):>8.0f} {len(done[BATCH]):>6} {p95(done[BATCH]):>8.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rpm", type=int, default=600)
+    parser.add_argument("--burst", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=6.0)
+    parser.add_argument("--latency", type=float, default=0.05, help="provider response time (s)")
+    args = parser.parse_args(argv)
+
+    print(f"{'mode':<10} {'ok/s':>8} {'quota/s':>8} {'errors':>7} {'429s seen':>9} "
+          f"{'inter.':>6} {'p95 ms':>8} {'batch':>6} {'p95 ms':>8}")
+    for mode in ("direct", "scheduler"):
+        run(mode, args.rpm, args.burst, args.workers, args.seconds, args.latency)
+
+
+if __name__ == "__main__":
+    main()
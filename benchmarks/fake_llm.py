@@ -0,0 +1,75 @@
+"""
+Offline stand-in for ChatGroq: a LangChain chat model that answers from recorded responses
+(benchmarks/fixtures/responses.json) with configurable latency.
+
+    llm = RecordedChatModel.from_fixtures(latency_s=0.3, tokens_per_s=250)
+    chain = Chain(llm=llm)
+
+Extraction prompts are matched to a recorded answer by a marker string from the page; every other
+prompt gets the recorded email. Token usage is reported in `usage_metadata` like Groq does, using
+the same estimate as the app (utils.estimate_tokens).
+"""
+import json
+import os
+import time
+from typing import Any, Dict
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from utils import estimate_tokens
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+class RecordedChatModel(BaseChatModel):
+    extract: Dict[str, Any] = {}     # page name -> {"match": marker, "response": [jobs]}
+    mail: str = ""
+    latency_s: float = 0.0           # time to first token
+    tokens_per_s: float = 0.0        # output speed; 0 = whole answer at once
+    chunk_chars: int = 16            # streamed chunk size
+
+    @classmethod
+    def from_fixtures(cls, path=None, **kwargs):
+        with open(path or os.path.join(FIXTURES, "responses.json"), encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(extract=data["extract"], mail=data["mail"], **kwargs)
+
+    @property
+    def _llm_type(self):
+        return "recorded"
+
+    def _answer(self, messages):
+        prompt = "\n".join(str(m.content) for m in messages)
+        if "SCRAPED TEXT FROM WEBSITE" in prompt:
+            for entry in self.extract.values():
+                if entry["match"] in prompt:
+                    return prompt, json.dumps(entry["response"], ensure_ascii=False)
+            return prompt, "[]"
+        return prompt, self.mail
+
+    def _usage(self, prompt, answer):
+        input_tokens, output_tokens = estimate_tokens(prompt), estimate_tokens(answer)
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens}
+
+    def _sleep_for(self, text):
+        if self.tokens_per_s:
+            time.sleep(estimate_tokens(text) / self.tokens_per_s)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt, answer = self._answer(messages)
+        time.sleep(self.latency_s)
+        self._sleep_for(answer)
+        message = AIMessage(content=answer, usage_metadata=self._usage(prompt, answer))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt, answer = self._answer(messages)
+        time.sleep(self.latency_s)
+        for i in range(0, len(answer), self.chunk_chars):
+            piece = answer[i:i + self.chunk_chars]
+            self._sleep_for(piece)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(prompt, answer)))